@@ -1,67 +1,157 @@
-import argparse
 import re
-import subprocess
 import sys
-import traceback
-from enum import IntEnum
-from semver.utils import get_tag_version
+import types
+from collections import OrderedDict
+from semver import timings
 from semver.logger import logging, logger, console_logger
-from semver.bump import bump_version
-
-try: 
-    from configparser import ConfigParser
-except ImportError:
-    # Python < 3
-    from ConfigParser import ConfigParser
 
 version = '0.0.0'
 
-class VersionType(IntEnum):
-    MAJOR = 0
-    MINOR = 1
-    PATCH = 2
-
 # Define common exceptions;
 NO_MERGE_FOUND = Exception('No merge found')
 NOT_MAIN_BRANCH = Exception('Not merging into a main branch')
 NO_GIT_FLOW = Exception('No git flow branch found')
+PUSH_FAILED = Exception('Could not push the new version')
+TAG_FAILED = Exception('Could not create the version tag')
 
 # Important regex
 GET_COMMIT_MESSAGE = re.compile(r"Merge (branch|pull request) '?([^']+)'? (into|from) (?:'(.+)'|[^\/]+\/([^\n\\]+))")
 
+# `git log` over a range of commits for SemVer(since=...): one NUL separated
+# `<sha>\n<message>` record per merge commit on the main line
+MERGE_LOG_ARGS = ['-c', 'log.showSignature=false', 'log', '-z', '--first-parent', '--format=%H%n%B',
+                  '-E', "--grep=^Merge (branch|pull request) "]
+LAST_TAG = 'last-tag'
+
+# commit_and_push() tries this many times, waiting PUSH_RETRY_DELAY seconds
+# longer before each retry
+PUSH_ATTEMPTS = 3
+PUSH_RETRY_DELAY = 1.0
+# version_repo() tries this many versions before giving up
+TAG_ATTEMPTS = 3
+
+# `semver.VersionType` and `semver.BranchClassifier` are imported from
+# semver.branches on first use, so `import semver` doesn't import `enum`
+LAZY_ATTRIBUTES = {'VersionType': 'semver.branches', 'BranchClassifier': 'semver.branches'}
+
+class _Package(types.ModuleType):
+    def __getattr__(self, name):
+        if name not in LAZY_ATTRIBUTES:
+            raise AttributeError("module {!r} has no attribute {!r}".format(self.__name__, name))
+        import importlib
+        return getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+
+sys.modules[__name__].__class__ = _Package
+
+# Print and/or save the timings recorded during a command line run
+def report_timings(table=False, json_file=None):
+    records = timings.stop()
+    if table:
+        sys.stderr.write(timings.format_table(records) + '\n')
+    if json_file:
+        timings.write_json(records, json_file)
+
+# Print a SemVer.describe() result as JSON or as `SEMVER_<FIELD>=value` lines
+def write_result(result, output_format, out=None):
+    import json
+
+    out = out or sys.stdout
+    if output_format == 'json':
+        out.write(json.dumps(result, indent=2) + '\n')
+        return
+    for field, value in result.items():
+        out.write('SEMVER_{}={}\n'.format(field.upper(), '' if value is None else value))
+
+# Exit code of the `semver` command for an error raised by SemVer.run()
+def get_exit_code(error):
+    if error == NO_MERGE_FOUND:
+        return 1
+    elif error == NOT_MAIN_BRANCH:
+        return 2
+    elif error == NO_GIT_FLOW:
+        return 3
+    elif error == PUSH_FAILED:
+        return 4
+    elif error == TAG_FAILED:
+        return 5
+    return 128
+
+# setup git user, `scope` is `--global` or `--local` to `repo_path`
+def configure_git_user(scope='--global', repo_path='.'):
+    from semver.utils import git_call
+
+    git_call(['config', scope, 'user.email', '"versioner@semver.com"'], cwd=repo_path)
+    git_call(['config', scope, 'user.name', '"Semantic Versioner"'], cwd=repo_path)
+
 class SemVer(object):
 
     # Merge pull request #1 from RightBrain-Networks/feature/PLAT-185-versioning
 
-    def __init__(self,global_user=False):
+    def __init__(self,global_user=False,snapshot=None,config=None,repo_path='.',since=None,
+                 plumbing=False,branch=None,notes=None,git_user=True):
         self.global_user = '--local' if global_user else '--global'
+        # False when the caller already set up the git user, see semver.fleet
+        self.git_user = git_user
+        self.repo_path = repo_path
+        self.since = since
+        # no work tree: bare mirrors and shallow clones, see semver.plumbing
+        self.plumbing = plumbing
+        self.branch = branch
+        self.merge_count = 0
+        self.snapshot = snapshot
+        # the package only imports what a run needs once a SemVer is made, so
+        # `semver_get_version --server` doesn't pay for it
+        from semver.config import load_config
+        from semver.branches import BranchClassifier
+        if config is None and plumbing:
+            from semver.plumbing import load_config as load_committed_config
+            config = load_committed_config(repo_path, branch)
+        self.config = config if config is not None else load_config(repo_path)
         self.merged_branch = None
         self.main_branch = None
         self.version_type = None
+        self.current_version = None
+        self.new_version = None
+
+        self.main_branches = list(self.config.main_branches)
+        self.major_branches = list(self.config.major_branches)
+        self.minor_branches = list(self.config.minor_branches)
+        self.patch_branches = list(self.config.patch_branches)
+        self.classifier = BranchClassifier.from_config(self.config)
+        # record each new version in refs/notes/semver, see semver.notes
+        self.notes = self.config.flag('notes') if notes is None else notes
+
+    # repository state shared by every step of the run, gathered on first use
+    def get_snapshot(self):
+        if self.snapshot is None:
+            if self.plumbing:
+                from semver import plumbing
+                self.snapshot = plumbing.load_snapshot(self.config, self.repo_path, self.branch)
+            else:
+                from semver.snapshot import RepoSnapshot
+                self.snapshot = RepoSnapshot.load(cwd=self.repo_path)
+        return self.snapshot
 
-        self.main_branches = self._setting_to_array('main_branches')
-        self.major_branches = self._setting_to_array('major_branches')
-        self.minor_branches = self._setting_to_array('minor_branches')
-        self.patch_branches = self._setting_to_array('patch_branches')
+    # latest version as it is now rather than when the snapshot was taken
+    def read_tag_version(self):
+        from semver.utils import get_tag_version
 
-    def _setting_to_array(self, setting):
-        config = ConfigParser()
-        config.read('./.bumpversion.cfg')
-        value = config.get('semver', setting)
-        # filter() removes empty string which is what we get if setting is blank
-        return list(filter(bool, [v.strip() for v in value.split(',')]))
+        if self.plumbing:
+            from semver import plumbing
+            self.snapshot.tags = plumbing.load_tags(self.config, self.repo_path)
+            return get_tag_version(snapshot=self.snapshot, config=self.config, repo_path=self.repo_path)
+        return get_tag_version(config=self.config, repo_path=self.repo_path)
 
     # based on commit message see what branches are involved in the merge
     def get_branches(self):
-        p = subprocess.Popen(['git', 'log', '-1'], stdout=subprocess.PIPE,
-                             cwd='.')
+        if self.since is not None:
+            return self.get_range_branches()
+        snapshot = self.get_snapshot()
+        message = snapshot.message
         #check current branch
-        b = subprocess.Popen(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], stdout=subprocess.PIPE,
-                             cwd='.')
-        message = str(p.stdout.read())
-        branch = b.stdout.read().decode('utf-8').rstrip()
+        branch = snapshot.branch
         logger.info('Main branch is ' + branch)
-        matches = GET_COMMIT_MESSAGE.search(message.replace('\\n','\n').replace('\\',''))
+        matches = GET_COMMIT_MESSAGE.search(message)
         if matches:
             if str(matches.group(4)) == branch:
                 self.merged_branch = matches.group(2)
@@ -70,108 +160,289 @@ class SemVer(object):
             self.main_branch = branch
         return bool(matches)
 
+    # (sha, message) of every merge into the current branch after `since`
+    # (a ref, or `last-tag` for the latest version tag), streamed from one git log
+    def iter_merges(self):
+        from semver import git
+        from semver.utils import get_tag_version
+
+        snapshot = self.get_snapshot()
+        since = self.since
+        if since == LAST_TAG:
+            since = snapshot.tag_commit(get_tag_version(snapshot=snapshot, config=self.config, repo_path=self.repo_path))
+        revisions = ['{}..{}'.format(since, snapshot.head)] if since else [snapshot.head]
+        for record in git.stream(MERGE_LOG_ARGS + revisions, cwd=self.repo_path, separator=b'\0'):
+            if record.strip():
+                sha, _, message = record.partition('\n')
+                yield sha, message
+
+    # Range counterpart of get_branches(): looks at every merge since
+    # `self.since` and keeps the branch asking for the biggest bump, so all of
+    # them end up in a single new version
+    def get_range_branches(self):
+        branch = self.get_snapshot().branch
+        logger.info('Main branch is ' + branch)
+        self.main_branch = branch
+        self.merge_count = 0
+        merged_branch, merged_type = None, None
+        for sha, message in self.iter_merges():
+            matches = GET_COMMIT_MESSAGE.search(message)
+            if not matches:
+                continue
+            name = matches.group(2) if str(matches.group(4)) == branch else matches.group(5)
+            if not name:
+                continue
+            self.merge_count += 1
+            version_type = self.classifier.classify(name)
+            logger.debug("Merge {} of {}: {}".format(sha[:12], name, version_type))
+            if merged_branch is None or (version_type is not None and
+                                         (merged_type is None or version_type < merged_type)):
+                merged_branch, merged_type = name, version_type
+        self.merged_branch = merged_branch
+        logger.info('Found {} merges since {}'.format(self.merge_count, self.since))
+        return self.merge_count > 0
+
     # based on branches involved see what type of versioning should be done
     def get_version_type(self):
         logger.info('Merged branch is ' + self.merged_branch)
 
-        merged_prefix = None
-        matches = re.findall("[^\/]*/", self.merged_branch)
-        if len(matches) >= 1:
-            merged_prefix = matches[-1][0:-1]
-
-        if merged_prefix:
-            for prefix in self.major_branches:
-                if prefix == merged_prefix:
-                    self.version_type = VersionType.MAJOR
-                    return self.version_type
-            for prefix in self.minor_branches:
-                if prefix == merged_prefix:
-                    self.version_type = VersionType.MINOR
-                    return self.version_type
-            for prefix in self.patch_branches:
-                if prefix == merged_prefix:
-                    self.version_type = VersionType.PATCH
-                    return self.version_type
-        return False
+        version_type = self.classifier.classify(self.merged_branch)
+        if version_type is None:
+            return False
+        self.version_type = version_type
+        return self.version_type
+
+    # version type of many branches at once, see BranchClassifier.classify_branches()
+    def classify_branches(self, branches):
+        return self.classifier.classify_branches(branches)
 
     # setup git settings so we can commit and tag
     def setup_git_user(self):
-        # setup git user
-        p = subprocess.Popen(['git', 'config', self.global_user, 'user.email',
-                              '"versioner@semver.com"'],
-                             cwd='.')
-        p = subprocess.Popen(['git', 'config', self.global_user, 'user.name',
-                              '"Semantic Versioner"'],
-                             cwd='.')
-        p.wait()
+        configure_git_user(self.global_user, self.repo_path)
         return self
 
-    # use bumpversion to increment the appropriate version type
+    # use bumpversion to increment the appropriate version type. The latest
+    # version is read again under the repository lock and only tagged if the
+    # next version doesn't exist yet; when another run got there first the
+    # version is resolved again and the bump retried.
     def version_repo(self):
-        config_file = ""
-        with open(".bumpversion.cfg", "r") as file:
-            config_file = file.read()
+        from semver.bump import bump_version
+        from semver.lock import RepoLock
+        from semver.utils import get_tag_version
 
         # version repo
         logger.debug("Running bumpversion of type: " + str(self.version_type.name))
-        bump_version(get_tag_version(), self.version_type)
-        return self
+        expected_version = get_tag_version(snapshot=self.get_snapshot(), config=self.config,
+                                           repo_path=self.repo_path)
+        with RepoLock(self.repo_path):
+            for attempt in range(TAG_ATTEMPTS):
+                self.current_version = self.read_tag_version()
+                if self.current_version != expected_version:
+                    logger.info("Version moved from {} to {}".format(expected_version, self.current_version))
+                    expected_version = self.current_version
+                try:
+                    self.new_version = bump_version(self.current_version, self.version_type,
+                                                    update_files=not self.plumbing, config=self.config,
+                                                    repo_path=self.repo_path,
+                                                    commit=self.snapshot.head if self.plumbing else None)
+                    return self
+                except Exception as e:
+                    if e != TAG_FAILED:
+                        raise
+                    logger.warning("Tag for the version after {} already exists, retrying".format(self.current_version))
+        raise TAG_FAILED
 
+    # push the branch and the new tag, and nothing else, in one atomic push.
+    # When it's rejected because the remote branch moved on, refetch it: if it
+    # already contains our commit only the tag still needs pushing. When the
+    # remote has our tag already, another pipeline released that version:
+    # fetch the remote tags and version again.
     def commit_and_push(self):
-        # push versioning commit
-        p = subprocess.Popen(['git', 'push', 'origin', self.main_branch],
-                             cwd='.')
-        p.wait()
-
-        # push versioning tag
-        p = subprocess.Popen(['git', 'push', 'origin', '--tags'],
-                             cwd='.')
-        p.wait()
+        import time
+        from semver.utils import git_call, git_output
+
+        refspecs = [self.main_branch]
+        if self.new_version:
+            refspecs.append('refs/tags/' + self.new_version)
+        for attempt in range(PUSH_ATTEMPTS):
+            if attempt:
+                time.sleep(PUSH_RETRY_DELAY * attempt)
+            if git_call(['push', '--atomic', 'origin'] + refspecs, cwd=self.repo_path) == 0:
+                return self
+
+            if self.new_version:
+                tag_ref = 'refs/tags/' + self.new_version
+                remote_tag = git_output(['ls-remote', 'origin', tag_ref], cwd=self.repo_path).split()
+                if remote_tag and remote_tag[0] != git_output(['rev-parse', tag_ref], cwd=self.repo_path).strip():
+                    logger.warning("{} was pushed by someone else, versioning again".format(self.new_version))
+                    git_call(['tag', '-d', self.new_version], cwd=self.repo_path)
+                    if not self.plumbing:
+                        git_call(['fetch', '--no-tags', 'origin', 'refs/tags/*:refs/tags/*'], cwd=self.repo_path)
+                    self.version_repo()
+                    refspecs[-1] = 'refs/tags/' + self.new_version
+                    continue
+
+            logger.warning("Push rejected, fetching origin/" + self.main_branch)
+            if git_call(['fetch', 'origin', self.main_branch], cwd=self.repo_path) != 0:
+                continue
+            if self.main_branch in refspecs and git_call(['merge-base', '--is-ancestor', self.get_snapshot().head, 'FETCH_HEAD'],
+                                                          cwd=self.repo_path) == 0:
+                refspecs.remove(self.main_branch)
+                if not refspecs:
+                    return self
+        raise PUSH_FAILED
+
+    # attach this run's decision to the versioned commit as a git note
+    def write_note(self):
+        from datetime import datetime
+        from semver.notes import write_note
+
+        record = {'version': self.new_version, 'previous_version': self.current_version,
+                  'version_type': self.version_type.name, 'merged_branch': self.merged_branch,
+                  'main_branch': self.main_branch, 'timestamp': datetime.utcnow().isoformat() + 'Z'}
+        write_note(self.get_snapshot().head, record, self.repo_path)
         return self
 
+    # Outcome of run() with the versions semver_get_version would print
+    # afterwards, see `semver --output`. `error` is what run() raised.
+    def describe(self, error=None, build=0):
+        from semver.get_version import get_version_state, format_version
+        from semver.utils import get_tag_version
+
+        result = OrderedDict([('status', get_exit_code(error) if error else 0),
+                              ('error', str(error) if error else None),
+                              ('main_branch', self.main_branch),
+                              ('merged_branch', self.merged_branch),
+                              ('version_type', self.version_type.name if self.version_type is not None else None),
+                              ('previous_version', self.current_version),
+                              ('new_version', self.new_version)])
+        if self.current_version is None:
+            # nothing was versioned, report the version the repository is at
+            result['previous_version'] = get_tag_version(snapshot=self.get_snapshot(), config=self.config,
+                                                         repo_path=self.repo_path)
+        if self.new_version:
+            # HEAD now carries the new tag
+            state = {'version': self.new_version, 'branch': self.get_snapshot().branch, 'tagged': True,
+                     'version_type': None}
+        else:
+            state = get_version_state(self.config, self.repo_path, snapshot=self.get_snapshot())
+        result['resolved_version'] = format_version(state, build, None, True, self.config)
+        for version_format in ('npm', 'maven', 'docker'):
+            result[version_format + '_version'] = format_version(state, build, version_format, config=self.config)
+        return result
+
     # 1) get branches from last commit message
     # 2) see if we're merging into a main branch
     # 3) see what type of versioning we should do
     # 4) version the repo
     def run(self,push=True):
-        if not self.get_branches():
+        with timings.timed('phase', 'get_branches', cwd=self.repo_path):
+            found = self.get_branches()
+        if not found:
             raise NO_MERGE_FOUND
         if self.main_branch not in self.main_branches:
             raise NOT_MAIN_BRANCH
-        if not self.get_version_type():
+        with timings.timed('phase', 'get_version_type', cwd=self.repo_path):
+            version_type = self.get_version_type()
+        if not version_type:
             raise NO_GIT_FLOW
+        if push and self.git_user:
+            with timings.timed('phase', 'setup_git_user', cwd=self.repo_path):
+                self.setup_git_user()
+        with timings.timed('phase', 'version_repo', cwd=self.repo_path):
+            self.version_repo()
         if push:
-            self.setup_git_user()
-        self.version_repo()
-        if push:
-            self.commit_and_push()
+            with timings.timed('phase', 'commit_and_push', cwd=self.repo_path):
+                self.commit_and_push()
+        # only now is the version final: commit_and_push() versions again
+        # when another run took our tag
+        if self.notes:
+            with timings.timed('phase', 'write_note', cwd=self.repo_path):
+                if push:
+                    from semver.notes import fetch_notes
+                    fetch_notes(self.repo_path)
+                self.write_note()
+                if push:
+                    from semver.notes import push_notes
+                    push_notes(self.repo_path)
         return self
 
 def main():
+    import argparse
+    import atexit
+    import json
+    import traceback
+
     parser = argparse.ArgumentParser(description='Bump Semantic Version.')
+    parser.add_argument('command', help='Instead of bumping: `serve` answers version queries for this repository over a Unix socket, `sort` and `max` read versions from stdin and print them in precedence order or only the highest', nargs='?', choices=['serve', 'sort', 'max'], default=None)
+    parser.add_argument('--reverse', help='Print the highest version first with `sort`', action='store_true', dest='reverse')
+    parser.add_argument('--socket', help='Socket path for `serve` (default: .git/semver.sock)', dest='socket', default=None)
     parser.add_argument('-n','--no-push', help='Do not try to push', action='store_false', dest='push')
     parser.add_argument('-g','--global-user', help='Set git user at a global level, helps in jenkins', action='store_true', dest='global_user')
     parser.add_argument('-D', '--debug', help='Sets logging level to DEBUG', action='store_true', dest='debug', default=False)
+    parser.add_argument('--since', help='Version every merge after this ref (or `last-tag`) with a single bump of the biggest type found', dest='since', default=None)
+    parser.add_argument('--plumbing', help='Version without a work tree (bare mirrors, shallow clones): tag with update-ref and update no files', action='store_true', dest='plumbing')
+    parser.add_argument('--branch', help='Branch to version with --plumbing instead of HEAD', dest='branch', default=None)
+    parser.add_argument('--notes', help='Record the new version on the commit in refs/notes/semver and push the notes', action='store_const', const=True, dest='notes', default=None)
+    parser.add_argument('-o', '--output', help='Print the outcome and the resolved versions as JSON or as SEMVER_<FIELD>=value lines', choices=['json', 'env'], default=None)
+    parser.add_argument('-b', '--build-number', help='Build number for the pre-release versions printed by --output', default=0)
+    parser.add_argument('-r', '--repos', help='Version each of these repositories (paths or glob patterns) and print the results as JSON', nargs='+', dest='repos', default=None)
+    parser.add_argument('-w', '--workers', help='Number of repositories to version at once with --repos', type=int, dest='workers', default=None)
+    parser.add_argument('--timings', help='Print how long each git call and phase took', action='store_true', dest='timings')
+    parser.add_argument('--timings-json', help='Write how long each git call and phase took to this file as JSON', dest='timings_json', default=None)
     args = parser.parse_args()
 
 
     if args.debug:
         console_logger.setLevel(logging.DEBUG)
+
+    if args.timings or args.timings_json:
+        timings.start()
+        atexit.register(report_timings, args.timings, args.timings_json)
+
+    if args.command in ('sort', 'max'):
+        from semver.versions import max_version, sort_versions
+        if args.command == 'max':
+            latest = max_version(sys.stdin)
+            if latest is None:
+                exit(1)
+            print(latest)
+        else:
+            sys.stdout.writelines(version.text + '\n' for version in sort_versions(sys.stdin, args.reverse))
+        return
+
+    if args.command == 'serve':
+        from semver.server import serve
+        serve(socket_path=args.socket)
+        return
+
+    if args.repos:
+        from semver.fleet import expand_repos, version_repos, DEFAULT_WORKERS
+        results = version_repos(expand_repos(args.repos), workers=args.workers or DEFAULT_WORKERS,
+                                push=args.push, global_user=args.global_user)
+        print(json.dumps(results, indent=2))
+        exit(128 if any(result['status'] == 128 for result in results) else 0)
+
+    semver, error = None, None
     try:
-        SemVer(global_user=args.global_user).run(push=args.push)
+        semver = SemVer(global_user=args.global_user, since=args.since, plumbing=args.plumbing, branch=args.branch,
+                        notes=args.notes)
+        semver.run(push=args.push)
     except Exception as e:
         logger.error(e)
         if args.debug:
             tb = sys.exc_info()[2]
             traceback.print_tb(tb)
-        if e == NO_MERGE_FOUND:
-            exit(1)
-        elif e == NOT_MAIN_BRANCH:
-            exit(2)
-        elif e == NO_GIT_FLOW:
-            exit(3)
+        error = e
+
+    if args.output:
+        if semver is not None:
+            result = semver.describe(error, args.build_number)
         else:
-            exit(128)
+            result = OrderedDict([('status', get_exit_code(error)), ('error', str(error))])
+        write_result(result, args.output)
+    if error is not None:
+        exit(get_exit_code(error))
 
 if __name__ == '__main__':
     try: main()
@@ -0,0 +1,81 @@
+import asyncio
+from semver.logger import logging, logger, console_logger
+from semver import refs, timings
+from semver.config import load_config
+from semver.snapshot import RepoSnapshot, LOG_ARGS, TAG_ARGS
+from semver import utils
+from semver.scope import tag_scope
+from semver.utils import latest_version, tag_version_pattern
+from semver.cache import VersionCache
+from semver.get_version import get_version_state, format_version
+
+# asyncio counterparts of the git facing functions, for applications that embed
+# semver in an event loop. Independent git queries run concurrently and no call
+# blocks the loop while git is running.
+
+# Run a git command and return its decoded stdout, empty string on failure
+async def git_output(args, cwd='.'):
+    with timings.timed('git', ' '.join(['git'] + list(args)), cwd=cwd) as event:
+        p = await asyncio.create_subprocess_exec('git', *args, cwd=cwd,
+                                                 stdout=asyncio.subprocess.PIPE,
+                                                 stderr=asyncio.subprocess.DEVNULL)
+        output = (await p.communicate())[0]
+        event['returncode'] = p.returncode
+    if p.returncode != 0:
+        return ''
+    return output.decode('utf-8')
+
+# RepoSnapshot.load() with the `git log` and `git for-each-ref` calls running at the same time
+async def load_snapshot(repo_path='.'):
+    log_output, tag_output = await asyncio.gather(git_output(LOG_ARGS, cwd=repo_path),
+                                                  git_output(TAG_ARGS, cwd=repo_path))
+    return RepoSnapshot.parse(log_output, tag_output)
+
+async def get_branches(semver):
+    if semver.snapshot is None:
+        semver.snapshot = await load_snapshot(semver.repo_path)
+    return semver.get_branches()
+
+async def get_tag_version(snapshot=None, config=None, repo_path='.'):
+    if config is None:
+        config = load_config(repo_path)
+    if tag_scope(config) != 'global':
+        # scoped lookups are one git call, keep it off the loop
+        return await asyncio.get_event_loop().run_in_executor(
+            None, utils.get_tag_version, snapshot, config, repo_path)
+    tag_pattern = tag_version_pattern(config.tag_name)
+
+    tag_names = None
+    if snapshot is not None:
+        tag_names = snapshot.tags
+    elif config.setting('ref_backend', 'git') == 'python':
+        tag_names = refs.read_tag_names(repo_path)
+
+    if tag_names is None:
+        tag_expression = config.tag_name.replace('{new_version}', '[0-9]*.[0-9]*.[0-9]*')
+        tag_names = (await git_output(['tag', '-l', tag_expression], cwd=repo_path)).splitlines()
+
+    version = latest_version(tag_names, tag_pattern) or config.current_version
+    logger.debug("Tag Version: " + str(version))
+    return version
+
+async def get_version(build=0, version_format=None, dot=False, cache=None, repo_path='.'):
+    config = load_config(repo_path)
+    if cache is None:
+        cache = config.flag('cache')
+
+    state = None
+    version_cache = VersionCache(repo_path, config=config) if cache else None
+    if version_cache:
+        state = version_cache.load()
+    if state is None:
+        snapshot = await load_snapshot(repo_path)
+        if tag_scope(config) != 'global':
+            # the scoped tag lookup runs git, keep it off the loop
+            state = await asyncio.get_event_loop().run_in_executor(
+                None, get_version_state, config, repo_path, snapshot)
+        else:
+            state = get_version_state(config, repo_path, snapshot=snapshot)
+        if version_cache:
+            version_cache.store(state)
+    return format_version(state, build, version_format, dot, config)
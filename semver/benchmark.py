@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from semver.logger import logging, logger, console_logger
+
+# Benchmarks for tag resolution, branch detection, version lookup and file
+# rewriting against synthetic local repositories. Nothing touches the network.
+#
+#   python benchmark.py --tags 50000 --branches 500 --output results.json
+#   python benchmark.py --tags 50000 --compare results.json
+
+BENCH_CONFIG = """
+[bumpversion]
+current_version = 0.0.0
+commit = False
+tag = True
+tag_name = {{new_version}}
+
+[bumpversion:glob:files/*.txt]
+search = version={{current_version}}
+replace = version={{new_version}}
+
+[semver]
+main_branches = master
+major_branches = major
+minor_branches = feature
+patch_branches = hotfix, bugfix
+"""
+
+MERGE_MESSAGE = "Merge branch 'feature/benchmark' into 'master'"
+
+# Nth synthetic version, unique for up to a million tags
+def synthetic_version(i):
+    return '{}.{}.{}'.format(i // 10000, (i // 100) % 100, i % 100)
+
+def _data(text):
+    data = text.encode('utf-8')
+    return b'data ' + str(len(data)).encode('ascii') + b'\n' + data + b'\n'
+
+# Build a repository with `commits` commits, `tags` version tags, `branches`
+# feature branches and `files` versioned files using a single `git fast-import`
+def create_repo(path, tags=1000, branches=100, commits=1000, files=50, packed=True):
+    os.makedirs(path)
+    subprocess.check_call(['git', 'init', '-q', path])
+    commits = max(commits, 2)
+
+    stream = []
+    for i in range(commits):
+        message = MERGE_MESSAGE if i == commits - 1 else 'Commit {}'.format(i)
+        stream.append(b'commit refs/heads/master\n')
+        stream.append('mark :{}\n'.format(i + 1).encode('ascii'))
+        stream.append('committer Benchmark <benchmark@example.com> {} +0000\n'.format(1500000000 + i).encode('ascii'))
+        stream.append(_data(message))
+        if i:
+            stream.append('from :{}\n'.format(i).encode('ascii'))
+        else:
+            stream.append(b'M 644 inline .bumpversion.cfg\n' + _data(BENCH_CONFIG.format()))
+            for f in range(files):
+                stream.append('M 644 inline files/{}.txt\n'.format(f).encode('ascii'))
+                stream.append(_data('name=file{}\nversion=0.0.0\n'.format(f)))
+        stream.append(b'M 644 inline history.txt\n' + _data('{}\n'.format(i)))
+
+    # Spread tags over all but the last commit so HEAD is never tagged
+    for i in range(tags):
+        stream.append('reset refs/tags/{}\nfrom :{}\n\n'.format(synthetic_version(i), 1 + i * (commits - 1) // max(tags, 1)).encode('ascii'))
+    for i in range(branches):
+        stream.append('reset refs/heads/feature/branch-{}\nfrom :{}\n\n'.format(i, 1 + i % commits).encode('ascii'))
+
+    p = subprocess.Popen(['git', 'fast-import', '--quiet'], stdin=subprocess.PIPE, cwd=path)
+    p.communicate(b''.join(stream))
+    if p.returncode != 0:
+        raise RuntimeError('git fast-import failed')
+
+    subprocess.check_call(['git', 'checkout', '-q', '-f', 'master'], cwd=path)
+    if packed:
+        subprocess.check_call(['git', 'pack-refs', '--all'], cwd=path)
+    return path
+
+# Run `func` `repeat` times (with `cleanup` after each, untimed) and summarize
+def measure(func, repeat, cleanup=None):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if cleanup:
+            cleanup()
+    samples.sort()
+    return {'min': samples[0], 'median': samples[len(samples) // 2],
+            'mean': sum(samples) / len(samples), 'repeat': repeat}
+
+def run_benchmarks(repo_path, repeat=5):
+    from semver import SemVer, refs
+    from semver.bump import update_file_version
+    from semver.get_version import get_version, get_all_branch_versions
+    from semver.snapshot import RepoSnapshot
+    from semver.utils import get_tag_version, latest_version, tag_version_pattern
+
+    def cli(*args):
+        def run():
+            subprocess.check_call([sys.executable, '-c'] + list(args), cwd=repo_path,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return run
+
+    # `semver -n` tags HEAD, so after each run drop that tag again
+    latest_tag = get_tag_version(repo_path=repo_path)
+    def drop_new_tag():
+        new_tag = get_tag_version(repo_path=repo_path)
+        if new_tag != latest_tag:
+            subprocess.call(['git', 'tag', '-d', new_tag], cwd=repo_path, stdout=subprocess.DEVNULL)
+        subprocess.call(['git', 'checkout', '-q', '--', '.'], cwd=repo_path)
+
+    pattern = tag_version_pattern('{new_version}')
+    cases = [
+        # interpreter startup on its own and with semver imported, the difference is our import cost
+        ('startup:python', cli('pass'), None),
+        ('startup:import semver.get_version', cli('import semver.get_version'), None),
+        ('get_tag_version', lambda: get_tag_version(repo_path=repo_path), None),
+        ('read_tag_names', lambda: latest_version(refs.read_tag_names(repo_path), pattern), None),
+        ('RepoSnapshot.load', lambda: RepoSnapshot.load(cwd=repo_path), None),
+        ('SemVer.get_branches', lambda: SemVer(repo_path=repo_path).get_branches(), None),
+        ('get_version', lambda: get_version(repo_path=repo_path), None),
+        ('get_all_branch_versions', lambda: get_all_branch_versions(repo_path=repo_path), None),
+        ('update_file_version', lambda: update_file_version('1.0.0', '0.0.0', repo_path=repo_path),
+         lambda: update_file_version('0.0.0', '1.0.0', repo_path=repo_path)),
+        ('cli:semver_get_version', cli('from semver.get_version import main; main()'), None),
+        ('cli:semver', cli('import semver; semver.main()', '-n'), drop_new_tag),
+    ]
+
+    results = {}
+    for name, func, cleanup in cases:
+        results[name] = measure(func, repeat, cleanup)
+        logger.info('{:<26} median {:.4f}s'.format(name, results[name]['median']))
+    return results
+
+def git_version():
+    return subprocess.check_output(['git', '--version']).decode('utf-8').strip()
+
+# Names of benchmarks whose median got slower than `threshold` times the baseline
+def compare(results, baseline, threshold=1.25):
+    regressions = []
+    for name, stats in results['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before and stats['median'] > before['median'] * threshold:
+            regressions.append(name)
+            logger.warning('{} regressed: {:.4f}s -> {:.4f}s'.format(name, before['median'], stats['median']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark auto-semver against synthetic repositories.')
+    parser.add_argument('--tags', help='Number of version tags', type=int, default=1000)
+    parser.add_argument('--branches', help='Number of feature branches', type=int, default=100)
+    parser.add_argument('--commits', help='Length of the history', type=int, default=1000)
+    parser.add_argument('--files', help='Number of versioned files', type=int, default=50)
+    parser.add_argument('--loose', help='Keep refs loose instead of packing them', action='store_false', dest='packed')
+    parser.add_argument('--repeat', help='Runs per benchmark', type=int, default=5)
+    parser.add_argument('--output', help='Write results to this JSON file', default=None)
+    parser.add_argument('--compare', help='Fail if any benchmark is slower than in this results file', default=None)
+    parser.add_argument('--threshold', help='Allowed slowdown factor for --compare', type=float, default=1.25)
+    parser.add_argument('--workdir', help='Create the synthetic repository here (kept afterwards)', default=None)
+    args = parser.parse_args()
+
+    console_logger.setLevel(logging.INFO)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='semver-benchmark-')
+    repo_path = os.path.join(workdir, 'repo')
+    try:
+        start = time.perf_counter()
+        create_repo(repo_path, args.tags, args.branches, args.commits, args.files, args.packed)
+        logger.info('Created repository in {:.2f}s'.format(time.perf_counter() - start))
+
+        results = {
+            'parameters': {'tags': args.tags, 'branches': args.branches, 'commits': args.commits,
+                           'files': args.files, 'packed': args.packed, 'repeat': args.repeat},
+            'environment': {'python': platform.python_version(), 'git': git_version(),
+                            'platform': platform.platform()},
+            'benchmarks': run_benchmarks(repo_path, args.repeat),
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            if compare(results, json.load(f), args.threshold):
+                exit(1)
+
+if __name__ == '__main__':
+    try: main()
+    except: raise
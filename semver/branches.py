@@ -0,0 +1,86 @@
+import fnmatch
+import re
+from collections import OrderedDict
+from enum import IntEnum
+
+class VersionType(IntEnum):
+    MAJOR = 0
+    MINOR = 1
+    PATCH = 2
+
+# Prefix of a branch name the `*_branches` settings are compared against: the
+# directory the branch lives in, e.g. `feature` for `user/feature/PLAT-185`
+def branch_prefix(branch):
+    parts = branch.split('/')
+    if len(parts) < 2:
+        return None
+    return parts[-2]
+
+# Compile a `*_rules` entry: `re:<regex>` is matched from the start of the
+# branch name, anything else is a glob over the whole branch name
+def compile_rule(rule):
+    if rule.startswith('re:'):
+        return re.compile(rule[len('re:'):])
+    return re.compile(fnmatch.translate(rule))
+
+class BranchClassifier(object):
+    # Decides the version type of a branch. Built once from the config: branch
+    # prefixes go into a dict so a lookup is O(1), optional regex/glob rules
+    # are compiled and only tried when no prefix matches.
+
+    def __init__(self, major_branches=(), minor_branches=(), patch_branches=(),
+                 major_rules=(), minor_rules=(), patch_rules=()):
+        # Insert in reverse precedence so a prefix listed for several types
+        # resolves to the biggest bump, same as the order they used to be checked in
+        self.prefixes = {}
+        for version_type, prefixes in ((VersionType.PATCH, patch_branches),
+                                       (VersionType.MINOR, minor_branches),
+                                       (VersionType.MAJOR, major_branches)):
+            for prefix in prefixes:
+                self.prefixes[prefix] = version_type
+
+        self.rules = []
+        for version_type, rules in ((VersionType.MAJOR, major_rules),
+                                    (VersionType.MINOR, minor_rules),
+                                    (VersionType.PATCH, patch_rules)):
+            for rule in rules:
+                self.rules.append((compile_rule(rule), version_type))
+
+    @classmethod
+    def from_config(cls, config):
+        key = (config.path, config.digest)
+        classifier = _classifiers.get(key)
+        if classifier is None:
+            classifier = cls(config.major_branches, config.minor_branches, config.patch_branches,
+                             config.major_rules, config.minor_rules, config.patch_rules)
+            _classifiers[key] = classifier
+        return classifier
+
+    # VersionType for a branch, None if it doesn't call for a version bump
+    def classify(self, branch):
+        prefix = branch_prefix(branch)
+        if prefix:
+            version_type = self.prefixes.get(prefix)
+            if version_type is not None:
+                return version_type
+        for rule, version_type in self.rules:
+            if rule.match(branch):
+                return version_type
+        return None
+
+    # {branch: VersionType or None} for many branches in a single pass
+    def classify_branches(self, branches):
+        result = OrderedDict()
+        for branch in branches:
+            if branch in result:
+                continue
+            prefix = branch_prefix(branch)
+            if prefix and prefix in self.prefixes:
+                result[branch] = self.prefixes[prefix]
+            elif self.rules:
+                result[branch] = self.classify(branch)
+            else:
+                result[branch] = None
+        return result
+
+_classifiers = {}
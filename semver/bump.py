@@ -1,65 +1,163 @@
-from enum import IntEnum
-import subprocess, os
+from collections import OrderedDict
+import os, mmap, re
 from semver.logger import logging, logger, console_logger
+from semver.cache import VersionCache
+from semver.config import load_config
+from semver.globs import expand_globs
+from semver.tagindex import TagIndex
+from semver.versions import Version
+from semver.utils import git_call
+from semver import TAG_FAILED
 
+# Version numbers of a tag with the tag_name prefix and suffix taken off,
+# leniently: `1.02.0` is 1.2.0 and a pre-release or build is ignored
+VERSION_NUMBERS = re.compile(r'^(\d+)\.(\d+)\.(\d+)(?:[-+].*)?$', re.S)
 
-try: 
-    from configparser import ConfigParser
-except ImportError:
-    # Python < 3
-    from ConfigParser import ConfigParser
+# Files rewritten at the same time by update_file_version()
+DEFAULT_WORKERS = 8
 
-def bump_version(version, index=2, tag_repo = True, update_files=True):
-    v = version.split('.')
-
-    # Bump version
-    v[index] = str(int(v[index]) + 1)
-
-    # Reset subversions
-    i = len(v) - 1
-    while i > index:
-        v[i] = '0'
-        i = i - 1
-
-    # Get new version
-    new_version = '.'.join(v)
+# `commit` tags that commit with `git update-ref` instead of HEAD with `git tag`,
+# which needs no work tree
+def bump_version(version, index=2, tag_repo = True, update_files=True, config=None, repo_path='.', commit=None):
+    tag_name = config.tag_name if config is not None else '{new_version}'
+    new_version = next_version(version, index, tag_name)
 
     # Tag new version
     if tag_repo and version != new_version:
-        p = subprocess.Popen(['git', 'tag', new_version], cwd='.')
-        p.wait()
+        tag_index = TagIndex(repo_path, config)
+        index_current = tag_index.path is not None and tag_index.current()
+        # `git tag` refuses to move an existing tag, so this fails rather than
+        # overwrite a version another run created in the meantime
+        if commit is not None:
+            # the empty old value makes update-ref fail if the tag exists
+            tag_args = ['update-ref', 'refs/tags/' + new_version, commit, '']
+        else:
+            tag_args = ['tag', new_version]
+        if git_call(tag_args, cwd=repo_path) != 0:
+            raise TAG_FAILED
+        # Cached versions no longer describe the repository
+        VersionCache(repo_path).invalidate()
+        tag_index.add(new_version, index_current)
     
     # Update local files
     if update_files:
-        update_file_version(new_version, version)
+        # files hold the bare version, not the tag name
+        update_file_version(tag_number(new_version, tag_name), tag_number(version, tag_name), config, repo_path)
 
     return new_version
 
-def update_file_version(new_version, version="0.0.0"):
-    # Open up config file
-    config = ConfigParser()
-    config.read('./.bumpversion.cfg')
-
-    for section in config.sections():
-        if len(section) > 17 and section[0:17] == "bumpversion:file:":
-            file_name = section[17:]
-            if os.path.isfile(file_name):
-                # Get search val from config
-                search_val = config.get(section, "search")
-                search_val = process_config_string(search_val, new_version, version)
-
-                # Get replace val from config
-                replace_val = config.get(section, "replace")
-                replace_val = process_config_string(replace_val, new_version, version)
-
-                # Update replace values in file
-                with open(file_name, 'r') as file:
-                    filedata = file.read()
-                filedata =filedata.replace(search_val,replace_val)
-                with open(file_name, 'w') as file:
-                    file.write(filedata)                
-            else:
-                logger.warning("Tried to version file: `" + file_name + "` but it doesn't exist!")
+# `version` bumped at `index` as a tag name built from `tag_name`, e.g.
+# release/1.2.0 -> release/1.3.0 for `release/{new_version}`
+def next_version(version, index=2, tag_name='{new_version}'):
+    prefix, number, suffix = split_tag(version, tag_name)
+    return prefix + str(number.bump(index)) + suffix
+
+# The version part of a tag named after `tag_name`. Anything else, such as a
+# bare current_version, is returned as it is.
+def tag_number(version, tag_name='{new_version}'):
+    prefix, _, suffix = tag_name.partition('{new_version}')
+    if version.startswith(prefix) and version.endswith(suffix) and len(version) > len(prefix) + len(suffix):
+        return version[len(prefix):len(version) - len(suffix)]
+    return version
+
+# Split a tag into (prefix, Version, suffix) around the `{new_version}` of
+# `tag_name`, e.g. release/1.02.0 into ('release/', Version(1, 2, 0), '')
+def split_tag(version, tag_name='{new_version}'):
+    prefix, _, suffix = tag_name.partition('{new_version}')
+    matches = VERSION_NUMBERS.match(tag_number(version, tag_name))
+    if not matches:
+        raise ValueError("{!r} is not a version named like {!r}".format(version, tag_name))
+    return prefix, Version(*(int(number) for number in matches.groups())), suffix
+
+# Update every `[bumpversion:file:...]` and `[bumpversion:glob:...]` target,
+# returning {file name: replacements made}
+def update_file_version(new_version, version="0.0.0", config=None, repo_path='.', workers=DEFAULT_WORKERS):
+    if config is None:
+        config = load_config(repo_path)
+
+    # Group replacements per file so each file is only ever handled by one worker,
+    # `./pom.xml` from a file: section and `pom.xml` from a glob are the same file
+    rewrites = OrderedDict()
+    for target in config.files:
+        file_name = os.path.normpath(os.path.join(repo_path, target.path))
+        if os.path.isfile(file_name):
+            search_val = target.search.render(new_version, version)
+            replace_val = target.replace.render(new_version, version)
+            rewrites.setdefault(file_name, []).append((search_val, replace_val))
+        else:
+            logger.warning("Tried to version file: `" + file_name + "` but it doesn't exist!")
+
+    if config.globs:
+        matches = expand_globs([target.path for target in config.globs], repo_path)
+        for target in config.globs:
+            if not matches[target.path]:
+                logger.warning("Tried to version files matching: `" + target.path + "` but none exist!")
+            search_val = target.search.render(new_version, version)
+            replace_val = target.replace.render(new_version, version)
+            for path in matches[target.path]:
+                file_name = os.path.normpath(os.path.join(repo_path, path))
+                if os.path.isfile(file_name):
+                    rewrites.setdefault(file_name, []).append((search_val, replace_val))
+
+    report = OrderedDict()
+    if not rewrites:
+        return report
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(rewrites)))) as pool:
+        futures = [(file_name, pool.submit(_rewrite_all, file_name, replacements))
+                   for file_name, replacements in rewrites.items()]
+        for file_name, future in futures:
+            report[file_name] = future.result()
+            logger.debug("Replaced {} occurrence(s) in {}".format(report[file_name], file_name))
+    return report
+
+def _rewrite_all(file_name, replacements):
+    return sum(rewrite_file(file_name, search_val, replace_val) for search_val, replace_val in replacements)
+
+# Replace every occurrence of `search_val` in a file and return how many were
+# replaced. The file is memory-mapped and streamed into a temporary file that
+# atomically replaces the original, files without a match are never written.
+# A symlink is followed so the file it points to is replaced, not the link.
+def rewrite_file(file_name, search_val, replace_val):
+    import shutil, tempfile
+
+    file_name = os.path.realpath(file_name)
+    search = search_val.encode('utf-8')
+    replace = replace_val.encode('utf-8')
+    if not search or os.path.getsize(file_name) == 0:
+        return 0
+
+    with open(file_name, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = data.find(search)
+            if index == -1:
+                return 0
+
+            count = 0
+            position = 0
+            view = memoryview(data)
+            tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(file_name),
+                                              prefix='.semver-', delete=False)
+            try:
+                with tmp:
+                    while index != -1:
+                        tmp.write(view[position:index])
+                        tmp.write(replace)
+                        count += 1
+                        position = index + len(search)
+                        index = data.find(search, position)
+                    tmp.write(view[position:])
+                shutil.copymode(file_name, tmp.name)
+                os.replace(tmp.name, file_name)
+            except Exception:
+                os.remove(tmp.name)
+                raise
+            finally:
+                view.release()
+        finally:
+            data.close()
+    return count
 
 def process_config_string(cfg_string, new_version, version):
     return cfg_string.replace("{new_version}", new_version).replace("{current_version}", version)
\ No newline at end of file
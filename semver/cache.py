@@ -0,0 +1,65 @@
+import os
+from semver.logger import logging, logger, console_logger
+from semver import refs
+from semver.config import load_config
+
+CACHE_FILE = 'semver-cache.json'
+
+class VersionCache(object):
+    # Resolved version state stored under `.git/` so repeated `semver_get_version`
+    # calls on an unchanged repository don't have to ask git anything.
+    #
+    # The entry is keyed by HEAD (sha and branch), the tag refs stat data (see
+    # refs.tag_refs_stat()) and a hash of `.bumpversion.cfg`; computing the key
+    # only reads a handful of small files.
+
+    def __init__(self, cwd='.', config=None):
+        self.cwd = cwd
+        self.config = config
+        git_dirs = refs.find_git_dirs(cwd)
+        self.git_dir, self.refs_dir = git_dirs if git_dirs else (None, None)
+        self.path = os.path.join(self.git_dir, CACHE_FILE) if self.git_dir else None
+
+    def key(self):
+        if self.path is None:
+            return None
+        head = refs.read_head(self.cwd)
+        if head is None:
+            return None
+
+        config = self.config if self.config is not None else load_config(self.cwd)
+        key = list(head) + refs.tag_refs_stat(self.refs_dir, config.tag_name)
+        key.append(config.digest)
+        return key
+
+    # cached state if it was stored for the current key, otherwise None
+    def load(self):
+        key = self.key()
+        if key is None or not os.path.isfile(self.path):
+            return None
+        import json
+        try:
+            with open(self.path, 'r') as f:
+                entry = json.load(f)
+        except ValueError:
+            return None
+        if entry.get('key') != key:
+            logger.debug("Version cache is stale")
+            return None
+        logger.debug("Version cache hit: " + str(entry['state']))
+        return entry['state']
+
+    def store(self, state):
+        key = self.key()
+        if key is None:
+            return
+        import json
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': key, 'state': state}, f)
+        os.replace(tmp_path, self.path)
+
+    def invalidate(self):
+        if self.path and os.path.isfile(self.path):
+            logger.debug("Invalidating version cache")
+            os.remove(self.path)
@@ -0,0 +1,123 @@
+import os
+import re
+from collections import namedtuple
+
+CONFIG_FILE = '.bumpversion.cfg'
+
+FILE_SECTION = 'bumpversion:file:'
+GLOB_SECTION = 'bumpversion:glob:'
+
+PLACEHOLDERS = re.compile(r'(\{new_version\}|\{current_version\})')
+
+class VersionTemplate(object):
+    # A `search`/`replace` value split around its placeholders once, so
+    # rendering it is a single join
+    __slots__ = ('template', 'parts')
+
+    def __init__(self, template):
+        self.template = template
+        self.parts = tuple(PLACEHOLDERS.split(template))
+
+    def render(self, new_version, current_version):
+        values = {'{new_version}': new_version, '{current_version}': current_version}
+        return ''.join(values[part] if i % 2 else part for i, part in enumerate(self.parts))
+
+# One `[bumpversion:file:<path>]` or `[bumpversion:glob:<pattern>]` section
+FileTarget = namedtuple('FileTarget', ['path', 'search', 'replace'])
+
+class Config(object):
+    # Immutable, parsed view of `.bumpversion.cfg`. Use `load_config()` to get
+    # one, it is only re-parsed when the file changes.
+    __slots__ = ('path', 'data', '_digest', 'current_version', 'tag_name', 'main_branches',
+                 'major_branches', 'minor_branches', 'patch_branches', 'major_rules', 'minor_rules',
+                 'patch_rules', 'files', 'globs', 'settings')
+
+    def __init__(self, path, data):
+        try:
+            from configparser import ConfigParser
+        except ImportError:
+            # Python < 3
+            from ConfigParser import ConfigParser
+
+        parser = ConfigParser()
+        parser.read_string(data, source=path)
+
+        values = {
+            'path': path,
+            'data': data,
+            '_digest': None,
+            'current_version': parser.get('bumpversion', 'current_version') or '0.0.0',
+            'tag_name': parser.get('bumpversion', 'tag_name'),
+            'main_branches': _setting_to_tuple(parser, 'main_branches'),
+            'major_branches': _setting_to_tuple(parser, 'major_branches'),
+            'minor_branches': _setting_to_tuple(parser, 'minor_branches'),
+            'patch_branches': _setting_to_tuple(parser, 'patch_branches'),
+            'major_rules': _setting_to_lines(parser, 'major_rules'),
+            'minor_rules': _setting_to_lines(parser, 'minor_rules'),
+            'patch_rules': _setting_to_lines(parser, 'patch_rules'),
+            'files': _file_targets(parser, FILE_SECTION),
+            'globs': _file_targets(parser, GLOB_SECTION),
+            'settings': dict(parser.items('semver')) if parser.has_section('semver') else {},
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is immutable")
+
+    # sha1 of the file contents, only computed when asked for
+    @property
+    def digest(self):
+        if self._digest is None:
+            import hashlib
+            object.__setattr__(self, '_digest', hashlib.sha1(self.data.encode('utf-8')).hexdigest())
+        return self._digest
+
+    # optional value from the `[semver]` section
+    def setting(self, option, default=None):
+        return self.settings.get(option, default)
+
+    def flag(self, option, default=False):
+        value = self.settings.get(option)
+        if value is None:
+            return default
+        return value.strip().lower() in ('1', 'yes', 'true', 'on')
+
+def _get(parser, section, option, default):
+    if parser.has_option(section, option):
+        return parser.get(section, option)
+    return default
+
+def _file_targets(parser, prefix):
+    return tuple(
+        FileTarget(section[len(prefix):],
+                   VersionTemplate(_get(parser, section, 'search', '{current_version}')),
+                   VersionTemplate(_get(parser, section, 'replace', '{new_version}')))
+        for section in parser.sections() if section.startswith(prefix) and len(section) > len(prefix))
+
+def _setting_to_tuple(parser, setting):
+    value = _get(parser, 'semver', setting, '')
+    # filter() removes empty string which is what we get if setting is blank
+    return tuple(filter(bool, [v.strip() for v in value.split(',')]))
+
+# one entry per line, so regexes are free to contain commas
+def _setting_to_lines(parser, setting):
+    value = _get(parser, 'semver', setting, '')
+    return tuple(filter(bool, [v.strip() for v in value.splitlines()]))
+
+_loaded = {}
+
+# Parsed config of the repository at `repo_path`, memoized per path, mtime and size
+def load_config(repo_path='.'):
+    path = os.path.abspath(os.path.join(repo_path, CONFIG_FILE))
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'r') as f:
+        config = Config(path, f.read())
+    _loaded[path] = (key, config)
+    return config
@@ -0,0 +1,51 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from semver.logger import logging, logger, console_logger
+from semver import SemVer, configure_git_user, get_exit_code
+
+DEFAULT_WORKERS = 8
+
+# Expand repository paths and glob patterns, keeping order and dropping duplicates
+def expand_repos(patterns):
+    repos = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            path = os.path.normpath(path)
+            if path not in repos:
+                repos.append(path)
+    return repos
+
+# Run the detect, bump and tag pipeline on one repository and describe the outcome
+def version_repo(repo_path, push=True, global_user=False, git_user=True):
+    result = {'repo': repo_path, 'status': 0, 'error': None, 'main_branch': None,
+              'merged_branch': None, 'version_type': None, 'previous_version': None,
+              'new_version': None}
+    try:
+        semver = SemVer(global_user=global_user, repo_path=repo_path, git_user=git_user)
+        try:
+            semver.run(push=push)
+        finally:
+            result['main_branch'] = semver.main_branch
+            result['merged_branch'] = semver.merged_branch
+            result['version_type'] = semver.version_type.name if semver.version_type is not None else None
+            result['previous_version'] = semver.current_version
+            result['new_version'] = semver.new_version
+    except Exception as e:
+        logger.debug("{}: {}".format(repo_path, e))
+        result['status'] = get_exit_code(e)
+        result['error'] = str(e)
+    return result
+
+# Version many repositories at once. Git calls are I/O bound so a thread pool
+# gives close to linear speedup; results come back in the order of `repo_paths`.
+def version_repos(repo_paths, workers=DEFAULT_WORKERS, push=True, global_user=False):
+    # The global git user is written to ~/.gitconfig once, not by every worker
+    # at the same time; `--global-user` (`--local`) stays per repository.
+    git_user = global_user
+    if push and not global_user:
+        configure_git_user('--global')
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(version_repo, repo_path, push, global_user, git_user) for repo_path in repo_paths]
+        return [future.result() for future in futures]
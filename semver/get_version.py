@@ -1,60 +1,260 @@
-import argparse
 import re
-import subprocess
+import sys
 from semver.logger import logging, logger, console_logger
-from semver.utils import get_tag_version, get_file_version, DEVNULL
-from semver import SemVer
-from semver.bump import bump_version
+from semver import refs, timings, report_timings
 
-def get_version(build=0,version_format=None,dot=False):
-    version = get_tag_version()
+# Everything else is imported where it is used: `semver_get_version --server`
+# only needs semver.server to ask the daemon.
+
+# Resolve the facts a version string is built from: latest version, current
+# branch, whether HEAD is that version and the branch's version type
+def get_version_state(config=None, repo_path='.', snapshot=None):
+    from semver.config import load_config
+    from semver.snapshot import RepoSnapshot
+    from semver.utils import get_tag_version
+
+    if config is None:
+        config = load_config(repo_path)
+
+    version = None
+    if snapshot is None and config.flag('tag_index'):
+        snapshot, version = _index_snapshot(config, repo_path)
+    # Everything below is answered from a single snapshot of the repository,
+    # the commit message isn't needed so this is a single `git for-each-ref`
+    if snapshot is None:
+        snapshot = RepoSnapshot.load_refs(cwd=repo_path)
+    if version is None:
+        version = get_tag_version(snapshot=snapshot, config=config, repo_path=repo_path)
 
     # Get the commit hash of the version 
-    v_hash = subprocess.Popen(['git', 'rev-list', '-n', '1', version], stdout=subprocess.PIPE,
-                             stderr=DEVNULL, cwd='.').stdout.read().decode('utf-8').rstrip()
+    v_hash = snapshot.tag_commit(version)
     # Get the current commit hash
-    c_hash = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
-                             stderr=DEVNULL, cwd='.').stdout.read().decode('utf-8').rstrip()
+    c_hash = snapshot.head
+
+    state = {'version': version, 'branch': snapshot.branch, 'tagged': v_hash == c_hash, 'version_type': None}
+    # HEAD is the latest version, there is nothing to classify
+    if not state['tagged']:
+        # the branch classifier and SemVer are only needed off a tag
+        from semver import SemVer
 
-    # If the version commit hash and current commit hash
-    # do not match return the branch name else return the version
-    if v_hash != c_hash:
         logger.debug("v_hash and c_hash do not match!")
-        branch = subprocess.Popen(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], stdout=subprocess.PIPE,
-                            stderr=DEVNULL, cwd='.').stdout.read().decode('utf-8').rstrip()
-        semver = SemVer()
-        semver.merged_branch = branch
+        semver = SemVer(snapshot=snapshot, config=config, repo_path=repo_path)
+        semver.merged_branch = snapshot.branch
         logger.debug("merged branch is: {}".format(semver.merged_branch))
         version_type = semver.get_version_type()
         logger.debug("version type is: {}".format(version_type))
+        if version_type is not False:
+            state['version_type'] = int(version_type)
+    return state
+
+# With `tag_index` the latest version comes from the index (see semver.tagindex)
+# and only that tag's commit is resolved, instead of listing every tag. Returns
+# (snapshot holding just that tag, version), or (None, None) when HEAD can't be
+# read from `.git`.
+def _index_snapshot(config, repo_path):
+    from semver.snapshot import RepoSnapshot
+    from semver.utils import get_tag_version, git_output
+
+    head = refs.read_head(repo_path)
+    refs_dir = refs.find_refs_dir(repo_path)
+    if head is None or refs_dir is None:
+        return None, None
+    version = get_tag_version(config=config, repo_path=repo_path)
+    snapshot = RepoSnapshot(head[0], head[1])
+    # a lightweight tag on HEAD is the common case, anything else is peeled by git
+    sha = refs.read_ref(refs_dir, 'refs/tags/' + version)
+    if sha is not None and sha != snapshot.head:
+        sha = git_output(['rev-parse', '-q', '--verify', 'refs/tags/{}^{{commit}}'.format(version)],
+                         cwd=repo_path).strip() or None
+    if sha is not None:
+        snapshot.tags[version] = sha
+    return snapshot, version
+
+def get_version(build=0,version_format=None,dot=False,cache=None,repo_path='.'):
+    from semver.config import load_config
+    from semver.cache import VersionCache
+
+    config = load_config(repo_path)
+    if cache is None:
+        cache = config.flag('cache')
+
+    state = None
+    version_cache = VersionCache(repo_path, config=config) if cache else None
+    if version_cache:
+        state = version_cache.load()
+    if state is None:
+        state = get_version_state(config, repo_path)
+        if version_cache:
+            version_cache.store(state)
+    return format_version(state, build, version_format, dot, config)
+
+# Turn a state from get_version_state() into the version, branch or pre-release string
+# `config` supplies the tag_name pre-release versions are named after
+def format_version(state, build=0, version_format=None, dot=False, config=None):
+    version = state['version']
+    branch = state['branch']
+
+    # If the version commit hash and current commit hash
+    # do not match return the branch name else return the version
+    if not state['tagged']:
+        version_type = state['version_type']
         if version_type:
+            from semver.bump import bump_version, split_tag
 
-            next_version = bump_version(get_tag_version(), version_type, False, False)
+            # keep the tag_name around the number, e.g. release/{new_version}
+            tag_name = config.tag_name if config is not None else '{new_version}'
+            prefix, next_version, suffix = split_tag(bump_version(version, version_type, False, False, config), tag_name)
+            identifier = re.sub(r'[/_]', '-', branch)
 
             if version_format in ('npm','docker'):
-                return "{}-{}.{}".format(next_version,re.sub(r'[/_]', '-', branch),build)
+                return prefix + str(next_version.with_prerelease(identifier, build)) + suffix
             if version_format == 'maven':
                 qualifier = 'SNAPSHOT' if build == 0 else build
-                return "{}-{}-{}".format(next_version,re.sub(r'[/_]', '-', branch),qualifier)
+                return prefix + str(next_version.with_prerelease('{}-{}'.format(identifier, qualifier))) + suffix
         if dot:
             branch = branch.replace('/','.')
         return branch
     return version
 
+# Every local and remote branch with its tip, plus all tags peeled to commits
+BRANCH_REF_ARGS = ['for-each-ref', '--format=%(refname)%00%(objectname)%00%(*objectname)%00%(symref)',
+                   'refs/heads/', 'refs/remotes/', 'refs/tags/']
+
+REPORT_FIELDS = ['branch', 'commit', 'version_type', 'next_version', 'version']
+
+# Predicted version of every local and remote branch without checking any of them
+# out. All refs come from one `git for-each-ref`, the latest tag is resolved once
+# and the branches are classified in a single pass. With a `tag_scope` the tag is
+# looked up for each branch tip instead.
+def get_all_branch_versions(build=0, version_format=None, dot=False, repo_path='.'):
+    from semver.branches import BranchClassifier
+    from semver.bump import bump_version
+    from semver.config import load_config
+    from semver.scope import scoped_tag_version, tag_scope
+    from semver.utils import get_file_version, git_output, latest_version, tag_version_pattern
+
+    config = load_config(repo_path)
+
+    branch_tips = []
+    tags = {}
+    for line in git_output(BRANCH_REF_ARGS, cwd=repo_path).splitlines():
+        refname, sha, peeled, symref = line.split('\0')
+        if symref:
+            # e.g. origin/HEAD
+            continue
+        if refname.startswith('refs/tags/'):
+            tags[refname[len('refs/tags/'):]] = peeled or sha
+        elif refname.startswith('refs/heads/'):
+            branch_tips.append((refname[len('refs/heads/'):], refname[len('refs/heads/'):], sha))
+        else:
+            name = refname[len('refs/remotes/'):]
+            # pre-release versions use the name the branch has once checked out
+            branch_tips.append((name, name.split('/', 1)[-1], sha))
+
+    tag_pattern = tag_version_pattern(config.tag_name)
+    latest = latest_version(tags, tag_pattern) or config.current_version
+    version_types = BranchClassifier.from_config(config).classify_branches(
+        local_name for name, local_name, sha in branch_tips)
+
+    scoped = tag_scope(config) != 'global'
+    tag_expression = config.tag_name.replace('{new_version}', '[0-9]*.[0-9]*.[0-9]*')
+    report = []
+    for name, local_name, sha in branch_tips:
+        version = latest
+        if scoped:
+            # each branch bumps from the tags in its own scope (its line, its history)
+            version = scoped_tag_version(config, tag_expression, tag_pattern, repo_path=repo_path,
+                                         head=(sha, local_name))
+            if version is None:
+                version = latest
+            elif not version:
+                version = get_file_version(config)
+        version_type = version_types[local_name]
+        state = {'version': version, 'branch': local_name, 'tagged': sha == tags.get(version),
+                 'version_type': int(version_type) if version_type is not None else None}
+        next_version = None
+        if not state['tagged'] and version_type is not None:
+            next_version = bump_version(version, version_type, False, False, config)
+        report.append({'branch': name, 'commit': sha,
+                       'version_type': version_type.name if version_type is not None else None,
+                       'next_version': next_version,
+                       'version': format_version(state, build, version_format, dot, config)})
+    return report
+
+def write_report(report, report_format='json', out=sys.stdout):
+    import csv
+    import json
+
+    if report_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(report)
+    else:
+        out.write(json.dumps(report, indent=2) + '\n')
+
+# Version from a running `semver serve`, or None when there is none to ask
+def get_server_version(build=0, version_format=None, dot=False, socket_path=None, repo_path='.'):
+    from semver.server import query
+
+    try:
+        response = query({'command': 'get_version', 'build': build, 'format': version_format, 'dot': dot},
+                         socket_path=socket_path, repo_path=repo_path)
+    except (OSError, ValueError) as e:
+        logger.debug("No version server: {}".format(e))
+        return None
+    if 'error' in response:
+        logger.debug("Version server error: {}".format(response['error']))
+        return None
+    return response['version']
 
 def main():
+    import argparse
+    import atexit
+
     parser = argparse.ArgumentParser(description='Get Version or Branch.')
     parser.add_argument('-d', '--dot', help='Switch out / for . to be used in docker tag', action='store_true', dest='dot')
     parser.add_argument('-D', '--debug', help='Sets logging level to DEBUG', action='store_true', dest='debug', default=False)
     parser.add_argument('-f', '--format', help='Format for pre-release version syntax', choices=['npm','maven','docker'], default=None)
     parser.add_argument('-b', '--build-number', help='Build number, used in pre-releases', default=0)
+    parser.add_argument('-c', '--cache', help='Reuse the version cached under .git/ while HEAD, tags and config are unchanged', action='store_const', const=True, dest='cache', default=None)
+    parser.add_argument('-a', '--all-branches', help='Report the predicted version of every local and remote branch', action='store_true', dest='all_branches')
+    parser.add_argument('--report-format', help='Output format of --all-branches', choices=['json','csv'], default='json')
+    parser.add_argument('--commit', help='Print the version `semver --notes` recorded for this commit instead (exit 1 if there is none)', dest='commit', default=None)
+    parser.add_argument('-s', '--server', help='Ask a running `semver serve` first, computing the version here if it is not reachable', action='store_true', dest='server')
+    parser.add_argument('--socket', help='Socket of the `semver serve` to ask (implies --server)', dest='socket', default=None)
+    parser.add_argument('--timings', help='Print how long each git call took', action='store_true', dest='timings')
+    parser.add_argument('--timings-json', help='Write how long each git call took to this file as JSON', dest='timings_json', default=None)
    
     args = parser.parse_args()
 
     if args.debug:
         console_logger.setLevel(logging.DEBUG)
 
-    print(get_version(args.build_number,args.format,args.dot))
+    # The thin client: answered by the daemon before anything else is imported
+    if (args.server or args.socket) and not (args.all_branches or args.commit):
+        version = get_server_version(args.build_number,args.format,args.dot,args.socket)
+        if version is not None:
+            print(version)
+            return
+
+    if args.timings or args.timings_json:
+        timings.start()
+        atexit.register(report_timings, args.timings, args.timings_json)
+
+    if args.all_branches:
+        write_report(get_all_branch_versions(args.build_number,args.format,args.dot), args.report_format)
+        return
+
+    if args.commit:
+        from semver.notes import read_note
+        note = read_note(args.commit)
+        if note is None:
+            logger.error("No version recorded for " + args.commit)
+            exit(1)
+        print(note['version'])
+        return
+
+    print(get_version(args.build_number,args.format,args.dot,args.cache))
 
 if __name__ == '__main__':
     try: main()
@@ -0,0 +1,170 @@
+import subprocess
+import threading
+from semver.logger import logging, logger, console_logger
+from semver import timings
+
+# Every git process semver starts goes through this module:
+#
+# - at most MAX_PROCESSES of them run at once, however many threads ask
+#   (fleet runs, the version server, run_many())
+# - each one is waited for, also when a timeout kills it or a caller stops
+#   reading a stream early, so none are left behind as zombies
+# - stderr is kept and logged when the command fails, and check=True turns a
+#   failure into a GitError
+# - every call is timed, see semver.timings
+#
+# CatFile keeps one `git cat-file --batch` process per repository for looking
+# up many objects without forking git for each of them.
+
+MAX_PROCESSES = 16
+# Seconds a git command may take before it is killed, None to wait forever
+DEFAULT_TIMEOUT = 600
+
+_slots = threading.BoundedSemaphore(MAX_PROCESSES)
+
+class GitError(Exception):
+    def __init__(self, args, returncode, stderr=''):
+        Exception.__init__(self, '`git {}` exited {}: {}'.format(' '.join(args), returncode, stderr.strip()))
+        self.git_args = args
+        self.returncode = returncode
+        self.stderr = stderr
+
+def _failed(args, returncode, stderr, check):
+    stderr = stderr.decode('utf-8', 'replace') if stderr else ''
+    logger.debug("git {} exited {}: {}".format(' '.join(args), returncode, stderr.strip()))
+    if check:
+        raise GitError(args, returncode, stderr)
+
+def _kill(p):
+    try:
+        p.kill()
+    except OSError:
+        pass
+
+# Run git and return (exit code, stdout). With capture=False the output goes
+# to ours instead, for commands whose progress the user should see.
+def run(args, cwd='.', check=False, timeout=DEFAULT_TIMEOUT, capture=True, input=None):
+    with _slots, timings.timed('git', ' '.join(['git'] + list(args)), cwd=cwd) as event:
+        p = subprocess.Popen(['git'] + list(args), cwd=cwd,
+                             stdin=subprocess.PIPE if input is not None else None,
+                             stdout=subprocess.PIPE if capture else None,
+                             stderr=subprocess.PIPE)
+        try:
+            output, stderr = p.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill(p)
+            output, stderr = p.communicate()
+            stderr = 'timed out after {}s'.format(timeout).encode('utf-8')
+        event['returncode'] = p.returncode
+    if p.returncode != 0:
+        _failed(args, p.returncode, stderr, check)
+    return p.returncode, (output or b'').decode('utf-8')
+
+# stdout of git, empty string if it failed
+def output(args, cwd='.', check=False, timeout=DEFAULT_TIMEOUT):
+    returncode, stdout = run(args, cwd, check, timeout)
+    return stdout if returncode == 0 else ''
+
+# exit code of git, its output going to ours
+def call(args, cwd='.', check=False, timeout=DEFAULT_TIMEOUT):
+    return run(args, cwd, check, timeout, capture=False)[0]
+
+# Decoded output of git one record at a time, split on `separator` (lines by
+# default) as it arrives. The process is reaped when the stream is exhausted,
+# closed or abandoned; `timeout` bounds the whole stream.
+def stream(args, cwd='.', separator=b'\n', check=False, timeout=DEFAULT_TIMEOUT):
+    import tempfile
+
+    with _slots, timings.timed('git', ' '.join(['git'] + list(args)), cwd=cwd) as event, \
+            tempfile.TemporaryFile() as stderr:
+        p = subprocess.Popen(['git'] + list(args), cwd=cwd, stdout=subprocess.PIPE, stderr=stderr)
+        timer = threading.Timer(timeout, _kill, (p,)) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        finished = False
+        try:
+            pending = b''
+            for chunk in iter(lambda: p.stdout.read(65536), b''):
+                records = (pending + chunk).split(separator)
+                pending = records.pop()
+                for record in records:
+                    yield record.decode('utf-8')
+            if pending:
+                yield pending.decode('utf-8')
+            finished = True
+        finally:
+            if timer:
+                timer.cancel()
+            if not finished:
+                # the caller stopped reading, git has nothing left to tell us
+                _kill(p)
+            p.stdout.close()
+            event['returncode'] = p.wait()
+            stderr.seek(0)
+            message = stderr.read()
+    if finished and p.returncode != 0:
+        _failed(args, p.returncode, message, check)
+
+# Run several git commands at once on a bounded pool and return their
+# (exit code, stdout) in order. `commands` are argument lists.
+def run_many(commands, cwd='.', workers=MAX_PROCESSES, timeout=DEFAULT_TIMEOUT):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(commands) or 1))) as pool:
+        futures = [pool.submit(run, args, cwd, False, timeout) for args in commands]
+        return [future.result() for future in futures]
+
+class CatFile(object):
+    # A persistent `git cat-file --batch` of one repository. Each lookup writes
+    # one line to it and reads the answer back, so resolving thousands of tags
+    # costs one process instead of thousands. Safe to share between threads.
+    #
+    #   with CatFile(repo_path) as objects:
+    #       sha = objects.resolve('refs/tags/1.2.0^{commit}')
+
+    def __init__(self, cwd='.'):
+        self.cwd = cwd
+        self.lock = threading.Lock()
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        if self.process is None or self.process.poll() is not None:
+            logger.debug("Starting git cat-file --batch in " + self.cwd)
+            self.process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=self.cwd,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+        return self.process
+
+    # (sha, type, contents) of an object name like `HEAD` or `v1.0^{commit}`,
+    # None when it doesn't name an object
+    def read(self, name):
+        with self.lock, timings.timed('git', 'git cat-file --batch ' + name, cwd=self.cwd) as event:
+            p = self._start()
+            p.stdin.write(name.encode('utf-8') + b'\n')
+            p.stdin.flush()
+            header = p.stdout.readline().decode('utf-8').split()
+            event['returncode'] = 0
+            if len(header) != 3:
+                event['returncode'] = 1
+                return None
+            sha, object_type, size = header
+            contents = p.stdout.read(int(size) + 1)[:-1]
+            return sha, object_type, contents
+
+    def resolve(self, name):
+        found = self.read(name)
+        return found[0] if found else None
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.stdout.close()
+            self.process.wait()
+            self.process = None
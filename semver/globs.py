@@ -0,0 +1,69 @@
+import os
+import re
+from collections import OrderedDict
+from semver.logger import logging, logger, console_logger
+from semver import git
+
+# Translate a `**/pom.xml` style glob into a regex over `/` separated relative paths:
+# `**/` matches any number of directories, `*` and `?` never cross a `/`
+def glob_to_regex(pattern):
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            chars = pattern[i + 1:end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            regex += '[' + chars + ']'
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile('^' + regex + '$')
+
+# Files of the work tree that aren't ignored, listed by git in a single walk.
+# Pathspecs narrow the listing down to what the patterns can match.
+def list_files(patterns, repo_path='.'):
+    pathspecs = [':(glob)' + pattern for pattern in patterns]
+    returncode, output = git.run(['ls-files', '-z', '--cached', '--others', '--exclude-standard', '--'] + pathspecs,
+                                 cwd=repo_path)
+    if returncode == 0:
+        # nothing listed means nothing matches, not that we should look ourselves
+        return sorted(set(filter(bool, output.split('\0'))))
+
+    # Not a git repository, walk it ourselves
+    files = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d != '.git']
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), repo_path).replace(os.sep, '/'))
+    return sorted(files)
+
+# {pattern: [matching paths relative to repo_path]} for every pattern, sharing one file listing
+def expand_globs(patterns, repo_path='.'):
+    matches = OrderedDict((pattern, []) for pattern in patterns)
+    if not matches:
+        return matches
+
+    compiled = [(pattern, glob_to_regex(pattern)) for pattern in matches]
+    for path in list_files(list(matches), repo_path):
+        for pattern, regex in compiled:
+            if regex.match(path):
+                matches[pattern].append(path)
+
+    for pattern, paths in matches.items():
+        logger.debug("Glob `{}` matched {} file(s)".format(pattern, len(paths)))
+    return matches
@@ -0,0 +1,69 @@
+import os
+import time
+from semver.logger import logging, logger, console_logger
+from semver import refs
+
+LOCK_FILE = 'semver.lock'
+# Seconds to wait for another run to release the lock
+LOCK_TIMEOUT = 300
+LOCK_POLL = 0.1
+
+LOCKED = Exception('Timed out waiting for the repository lock')
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class RepoLock(object):
+    # Exclusive lock on `.git/semver.lock`, held while the latest version is
+    # resolved and the next one tagged, so parallel runs on the same repository
+    # or workspace take turns instead of computing the same version.
+    #
+    #   with RepoLock(repo_path):
+    #       ...
+
+    def __init__(self, cwd='.', timeout=LOCK_TIMEOUT):
+        git_dirs = refs.find_git_dirs(cwd)
+        if git_dirs is None:
+            from semver.utils import git_output
+            common_dir = git_output(['rev-parse', '--git-common-dir'], cwd=cwd).strip()
+            git_dirs = (None, os.path.join(cwd, common_dir or '.git'))
+        self.path = os.path.join(git_dirs[1], LOCK_FILE)
+        self.timeout = timeout
+        self.fd = None
+
+    def _try_lock(self):
+        if fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                os.close(fd)
+                return None
+            return fd
+        # without flock the lock is the file itself
+        try:
+            return os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except OSError:
+            return None
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        self.fd = self._try_lock()
+        if self.fd is None:
+            logger.info("Waiting for " + self.path)
+        while self.fd is None:
+            if time.time() > deadline:
+                raise LOCKED
+            time.sleep(LOCK_POLL)
+            self.fd = self._try_lock()
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is None:
+            os.remove(self.path)
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
@@ -1,19 +1,52 @@
-import logging
-import subprocess
+import sys
 
-# create logger
-logger = logging.getLogger('simple_example')
-logger.setLevel(logging.DEBUG)
+# `logging`, `logger` and `console_logger` are imported by every module, but the
+# logging package is only imported and configured the first time one of them is
+# actually used, keeping it off the startup path of `semver_get_version`.
 
-# create console handler and set level to INFO
-console_logger = logging.StreamHandler()
-console_logger.setLevel(logging.INFO)
+_configured = None
 
-# create formatter
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+def _configure():
+    global _configured
+    if _configured is None:
+        import logging
 
-# add formatter to console_logger
-console_logger.setFormatter(formatter)
+        # create logger
+        logger = logging.getLogger('simple_example')
+        logger.setLevel(logging.DEBUG)
 
-# add console_logger to logger
-logger.addHandler(console_logger)
\ No newline at end of file
+        # create console handler and set level to INFO
+        console_logger = logging.StreamHandler()
+        console_logger.setLevel(logging.INFO)
+
+        # create formatter
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+        # add formatter to console_logger
+        console_logger.setFormatter(formatter)
+
+        # add console_logger to logger
+        logger.addHandler(console_logger)
+
+        _configured = (logging, logger, console_logger)
+    return _configured
+
+class _Lazy(object):
+    def __init__(self, index):
+        self._index = index
+
+    def __getattr__(self, name):
+        return getattr(_configure()[self._index], name)
+
+class _LazyLogger(_Lazy):
+    # Debug records are dropped by the console handler unless someone lowered its
+    # level or attached their own handler, and neither can happen before the
+    # logging package is imported. Until then there is no need to import it.
+    def debug(self, *args, **kwargs):
+        if _configured is None and 'logging' not in sys.modules:
+            return
+        _configure()[1].debug(*args, **kwargs)
+
+logging = _Lazy(0)
+logger = _LazyLogger(1)
+console_logger = _Lazy(2)
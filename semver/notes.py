@@ -0,0 +1,76 @@
+import re
+from semver.logger import logging, logger, console_logger
+from semver import git
+
+# Each versioning decision can be recorded as a JSON note on the versioned
+# commit under refs/notes/semver (`semver --notes` or `notes = true`):
+#
+#   {"version": "1.3.0", "version_type": "MINOR", "merged_branch": "feature/x",
+#    "main_branch": "master", "previous_version": "1.2.0", "timestamp": "..."}
+#
+# Notes are ordinary refs, so once pushed every clone can look up what any
+# commit was versioned as with `semver_get_version --commit <rev>`. Reading one
+# is a few lines written to a single `git cat-file --batch` process.
+
+NOTES_REF = 'refs/notes/semver'
+# where push_notes() fetches the remote notes to merge them
+REMOTE_NOTES_REF = 'refs/notes/semver-remote'
+
+FULL_SHA = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+def write_note(commit, record, repo_path='.'):
+    import json
+    return git.call(['notes', '--ref', NOTES_REF, 'add', '-f', '-m', json.dumps(record, sort_keys=True), commit],
+                    cwd=repo_path)
+
+# Note paths a commit can have in the notes tree, git fans them out into
+# `ab/cdef...` directories once there are many notes
+def note_paths(sha):
+    return [NOTES_REF + ':' + '/'.join([sha[i:i + 2] for i in range(0, depth * 2, 2)] + [sha[depth * 2:]])
+            for depth in range(4)]
+
+# Recorded decision for a commit (any revision), None if it has no note
+def read_note(revision, repo_path='.', objects=None):
+    import json
+
+    own = objects is None
+    objects = objects or git.CatFile(repo_path)
+    try:
+        sha = revision if FULL_SHA.match(revision) else objects.resolve(revision + '^{commit}')
+        if sha is None:
+            return None
+        for path in note_paths(sha):
+            found = objects.read(path)
+            if found is not None and found[1] == 'blob':
+                return json.loads(found[2].decode('utf-8'))
+        return None
+    finally:
+        if own:
+            objects.close()
+
+# Start from the remote's notes so our push fast-forwards it. Nothing to fetch
+# is fine, the first run creates the notes ref.
+def fetch_notes(repo_path='.', remote='origin'):
+    return git.call(['fetch', '-q', remote, NOTES_REF + ':' + NOTES_REF], cwd=repo_path)
+
+# Share the notes with everyone else. A push rejected because another run added
+# notes in the meantime merges theirs into ours and tries again, like
+# SemVer.commit_and_push. Giving up only costs the remote these notes until the
+# next run.
+def push_notes(repo_path='.', remote='origin'):
+    import time
+    import semver
+
+    for attempt in range(semver.PUSH_ATTEMPTS):
+        if attempt:
+            time.sleep(semver.PUSH_RETRY_DELAY * attempt)
+        if git.call(['push', remote, NOTES_REF], cwd=repo_path) == 0:
+            return True
+        logger.warning("Push of {} rejected, merging the remote notes".format(NOTES_REF))
+        if git.call(['fetch', '-q', remote, '+' + NOTES_REF + ':' + REMOTE_NOTES_REF], cwd=repo_path) != 0:
+            continue
+        # notes are per commit, for the same commit ours is the newer decision
+        if git.call(['notes', '--ref', NOTES_REF, 'merge', '-q', '-s', 'ours', REMOTE_NOTES_REF], cwd=repo_path) != 0:
+            git.call(['notes', '--ref', NOTES_REF, 'merge', '--abort'], cwd=repo_path)
+    logger.warning("Could not push " + NOTES_REF)
+    return False
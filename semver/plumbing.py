@@ -0,0 +1,56 @@
+from semver.logger import logging, logger, console_logger
+from semver import git
+from semver.snapshot import RepoSnapshot, LOG_ARGS, TAG_ARGS, TAG_REF_PREFIX
+
+# Versioning without a work tree, for bare mirrors and shallow CI clones
+# (`semver --plumbing`). The merge, branch and tags are read with `git log`,
+# `git for-each-ref` and `git ls-remote`, the tag is written with
+# `git update-ref`, and no files are rewritten.
+#
+# A shallow clone usually lacks the older version tags, so their names and
+# commits are listed from the remote instead; nothing else is fetched.
+
+DEFAULT_REMOTE = 'origin'
+
+def revision(branch=None):
+    return 'refs/heads/' + branch if branch else 'HEAD'
+
+# `.bumpversion.cfg` as committed on `branch`, read from the object database
+def load_config(repo_path='.', branch=None):
+    from semver.config import Config, CONFIG_FILE
+
+    name = '{}:{}'.format(revision(branch), CONFIG_FILE)
+    returncode, data = git.run(['cat-file', 'blob', name], cwd=repo_path, check=True)
+    return Config(name, data)
+
+def is_shallow(repo_path='.'):
+    return git.output(['rev-parse', '--is-shallow-repository'], cwd=repo_path).strip() == 'true'
+
+# tag name -> commit of the version tags on a remote, peeled like RepoSnapshot.tags
+def remote_tags(tag_name, repo_path='.', remote=DEFAULT_REMOTE):
+    pattern = TAG_REF_PREFIX + tag_name.replace('{new_version}', '*')
+    tags = {}
+    for line in git.output(['ls-remote', '--tags', remote, pattern], cwd=repo_path).splitlines():
+        sha, _, ref = line.partition('\t')
+        name = ref[len(TAG_REF_PREFIX):]
+        if name.endswith('^{}'):
+            tags[name[:-len('^{}')]] = sha
+        elif name not in tags:
+            tags[name] = sha
+    return tags
+
+# Local tags, plus the remote's version tags when the clone is shallow
+def load_tags(config, repo_path='.', remote=DEFAULT_REMOTE):
+    tags = RepoSnapshot.parse('', git.output(TAG_ARGS, cwd=repo_path)).tags
+    if is_shallow(repo_path) and remote in git.output(['remote'], cwd=repo_path).split():
+        logger.info("Shallow clone, reading version tags from " + remote)
+        tags.update(remote_tags(config.tag_name, repo_path, remote))
+    return tags
+
+# RepoSnapshot of `branch` (HEAD by default) that needs no checkout
+def load_snapshot(config, repo_path='.', branch=None):
+    snapshot = RepoSnapshot.parse(git.output(LOG_ARGS + [revision(branch)], cwd=repo_path), '')
+    if branch:
+        snapshot.branch = branch
+    snapshot.tags = load_tags(config, repo_path)
+    return snapshot
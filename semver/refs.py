@@ -0,0 +1,153 @@
+import mmap
+import os
+import re
+from semver.logger import logging, logger, console_logger
+
+# `<sha> refs/tags/<name>` lines of a packed-refs file, peeled `^<sha>` lines are skipped
+PACKED_TAG_REF = re.compile(br'^[0-9a-f]{40,64} refs/tags/(.+?)\r?$', re.M)
+
+TAGS_DIR = os.path.join('refs', 'tags')
+
+# Locate the git directory of a work tree and the common directory holding its
+# refs, following `.git` files and linked worktrees. Returns None when the
+# layout is anything we don't want to interpret ourselves so callers fall back
+# to the git CLI.
+def find_git_dirs(cwd='.'):
+    if os.environ.get('GIT_DIR') or os.environ.get('GIT_COMMON_DIR'):
+        return None
+
+    git_dir = os.path.join(cwd, '.git')
+    if os.path.isfile(git_dir):
+        with open(git_dir, 'r') as f:
+            line = f.readline().strip()
+        if not line.startswith('gitdir:'):
+            return None
+        git_dir = os.path.join(cwd, line[len('gitdir:'):].strip())
+    if not os.path.isdir(git_dir):
+        return None
+
+    common_dir = git_dir
+    commondir = os.path.join(git_dir, 'commondir')
+    if os.path.isfile(commondir):
+        with open(commondir, 'r') as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+
+    # reftable repositories don't have packed-refs/loose refs at all
+    if os.path.isdir(os.path.join(common_dir, 'reftable')):
+        return None
+    return git_dir, common_dir
+
+# Directory holding packed-refs and refs/tags, None if git should be asked instead
+def find_refs_dir(cwd='.'):
+    git_dirs = find_git_dirs(cwd)
+    if git_dirs is None:
+        return None
+    refs_dir = git_dirs[1]
+
+    # shallow clones are frequently missing tags, let git sort those out
+    if os.path.isfile(os.path.join(refs_dir, 'shallow')):
+        return None
+    if not os.path.isdir(os.path.join(refs_dir, TAGS_DIR)):
+        return None
+    return refs_dir
+
+# Sha a ref points at, read from its loose file or packed-refs. None if the ref
+# doesn't exist or is symbolic.
+def read_ref(refs_dir, ref):
+    loose = os.path.join(refs_dir, *ref.split('/'))
+    if os.path.isfile(loose):
+        with open(loose, 'r') as f:
+            content = f.read().strip()
+        if content.startswith('ref:'):
+            return None
+        return content
+
+    packed_refs = os.path.join(refs_dir, 'packed-refs')
+    if os.path.isfile(packed_refs) and os.path.getsize(packed_refs) > 0:
+        pattern = re.compile(br'^([0-9a-f]{40,64}) ' + re.escape(ref.encode('utf-8')) + br'\r?$', re.M)
+        with open(packed_refs, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                matches = pattern.search(data)
+                # copy the sha out, the match refers to the mmap closed below
+                sha = bytes(matches.group(1)) if matches else None
+            finally:
+                data.close()
+        if sha is not None:
+            return sha.decode('utf-8')
+    return None
+
+# (HEAD sha, branch name) without forking git, branch is `HEAD` when detached.
+# Returns None if HEAD can't be resolved this way (unborn branch, odd layout).
+def read_head(cwd='.'):
+    git_dirs = find_git_dirs(cwd)
+    if git_dirs is None:
+        return None
+    git_dir, common_dir = git_dirs
+
+    with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+        content = f.read().strip()
+    if not content.startswith('ref:'):
+        return content, 'HEAD'
+
+    ref = content[len('ref:'):].strip()
+    sha = read_ref(common_dir, ref)
+    if sha is None:
+        return None
+    branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    return sha, branch
+
+# Stat data that changes whenever tags are packed, added or removed at the top
+# of refs/tags: [packed-refs mtime, packed-refs size, refs/tags mtime]. Tag
+# names like `release/{new_version}` live in a subdirectory of refs/tags, whose
+# mtime is added for them.
+def tag_refs_stat(refs_dir, tag_name='{new_version}'):
+    packed_refs = os.path.join(refs_dir, 'packed-refs')
+    if os.path.isfile(packed_refs):
+        stat = os.stat(packed_refs)
+        key = [stat.st_mtime, stat.st_size]
+    else:
+        key = [None, None]
+    tags_dir = os.path.join(refs_dir, TAGS_DIR)
+    key.append(os.stat(tags_dir).st_mtime if os.path.isdir(tags_dir) else None)
+    prefix_dir = os.path.dirname(tag_name.partition('{new_version}')[0])
+    if prefix_dir:
+        tags_dir = os.path.join(tags_dir, *prefix_dir.split('/'))
+        key.append(os.stat(tags_dir).st_mtime if os.path.isdir(tags_dir) else None)
+    return key
+
+# Names of every tag in the repository, read straight from packed-refs and
+# refs/tags without forking git. Returns None if the repository can't be read
+# this way.
+def read_tag_names(cwd='.'):
+    refs_dir = find_refs_dir(cwd)
+    if refs_dir is None:
+        return None
+
+    names = set()
+
+    packed_refs = os.path.join(refs_dir, 'packed-refs')
+    if os.path.isfile(packed_refs) and os.path.getsize(packed_refs) > 0:
+        with open(packed_refs, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for match in PACKED_TAG_REF.finditer(data):
+                    names.add(match.group(1).decode('utf-8'))
+            finally:
+                data.close()
+
+    tags_dir = os.path.join(refs_dir, TAGS_DIR)
+    for root, dirs, files in os.walk(tags_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            if file_name.endswith('.lock'):
+                continue
+            with open(path, 'rb') as f:
+                content = f.read(5)
+            # symbolic tag refs are too unusual to resolve by hand
+            if content.startswith(b'ref:'):
+                return None
+            names.add(os.path.relpath(path, tags_dir).replace(os.sep, '/'))
+
+    logger.debug("Read {} tags from {}".format(len(names), refs_dir))
+    return names
@@ -0,0 +1,128 @@
+import os
+import re
+from semver.logger import logging, logger, console_logger
+from semver import refs
+
+# `[semver] tag_scope` decides which version tags a branch bumps from:
+#
+#   global    the highest version tag in the repository (default)
+#   line      on maintenance branches like `release/1.x` or `support/2.3.x`,
+#             the highest tag of that major (or major.minor) line
+#   ancestry  the highest tag reachable from HEAD, still restricted to the
+#             line on maintenance branches
+SCOPES = ('global', 'line', 'ancestry')
+
+REACHABLE_FILE = os.path.join('semver', 'reachable.json')
+# HEADs remembered per tag state by the reachability cache
+REACHABLE_ENTRIES = 256
+
+LINE_BRANCH = re.compile(r'(?:^|/)v?(\d+)\.(?:(\d+)\.)?x$')
+
+# (major,) or (major, minor) of a maintenance branch name, None for other branches
+def branch_line(branch):
+    matches = LINE_BRANCH.search(branch or '')
+    if not matches:
+        return None
+    major, minor = matches.groups()
+    return (int(major),) if minor is None else (int(major), int(minor))
+
+def tag_scope(config):
+    scope = config.setting('tag_scope', 'global')
+    if scope not in SCOPES:
+        raise ValueError("tag_scope must be one of {}, not {}".format(', '.join(SCOPES), scope))
+    return scope
+
+# Names of the tags matching `tag_expression` that are reachable from `head`,
+# all of them from one history traversal by `git tag --merged`
+def reachable_tags(head, tag_expression, repo_path='.'):
+    from semver import git
+    return git.stream(['tag', '--merged', head, '-l', tag_expression], cwd=repo_path)
+
+class ReachabilityCache(object):
+    # Highest reachable version per HEAD in `.git/semver/reachable.json`. The
+    # entries are dropped together whenever the tag refs change, so CI runs and
+    # `semver_get_version` calls on commits already seen skip the traversal.
+
+    def __init__(self, cwd='.', tag_name='{new_version}'):
+        git_dirs = refs.find_git_dirs(cwd)
+        self.refs_dir = refs.find_refs_dir(cwd) if git_dirs else None
+        self.path = os.path.join(git_dirs[1], REACHABLE_FILE) if self.refs_dir else None
+        self.tag_name = tag_name
+
+    def key(self):
+        return refs.tag_refs_stat(self.refs_dir, self.tag_name) + [self.tag_name]
+
+    def _load(self):
+        import json
+        try:
+            with open(self.path, 'r') as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return entry['heads'] if entry.get('key') == self.key() else {}
+
+    def get(self, head):
+        if self.path is None:
+            return None
+        return self._load().get(head)
+
+    def put(self, head, version):
+        if self.path is None:
+            return
+        import json
+        heads = self._load()
+        if len(heads) >= REACHABLE_ENTRIES:
+            heads = {}
+        heads[head] = version
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': self.key(), 'heads': heads}, f)
+        os.replace(tmp_path, self.path)
+
+# Latest version tag in the configured scope, '' if the scope has no version
+# tags and None when the scope is global and the caller should look at every tag.
+# `head` is the (commit, branch name) to scope for when that isn't HEAD.
+def scoped_tag_version(config, tag_expression, tag_pattern, snapshot=None, repo_path='.', head=None):
+    from semver.utils import latest_version
+
+    scope = tag_scope(config)
+    if scope == 'global':
+        return None
+
+    if head is None and snapshot is not None:
+        head = snapshot.head, snapshot.branch
+    elif head is None:
+        head = refs.read_head(repo_path)
+        if head is None:
+            from semver.utils import git_output
+            head = tuple(git_output(['rev-parse', 'HEAD', '--abbrev-ref', 'HEAD'], cwd=repo_path).split())
+    line = branch_line(head[1]) if len(head) > 1 else None
+    logger.debug("Tag scope {} on line {}".format(scope, line))
+
+    if scope == 'line':
+        if line is None:
+            return None
+        if config.flag('tag_index'):
+            from semver.tagindex import TagIndex
+            index = TagIndex(repo_path, config)
+            if index.path is not None:
+                return index.latest_on_line(*line) or ''
+        names = snapshot.tags if snapshot is not None else _tag_names(tag_expression, repo_path)
+        return latest_version(names, tag_pattern, line) or ''
+
+    cache = ReachabilityCache(repo_path, config.tag_name)
+    cache_key = '{}:{}'.format(head[0], '.'.join(str(number) for number in line or ()))
+    version = cache.get(cache_key)
+    if version is None:
+        version = latest_version(reachable_tags(head[0], tag_expression, repo_path), tag_pattern, line) or ''
+        cache.put(cache_key, version)
+    return version
+
+def _tag_names(tag_expression, repo_path):
+    from semver.utils import git_output
+    names = refs.read_tag_names(repo_path)
+    if names is None:
+        names = git_output(['tag', '-l', tag_expression], cwd=repo_path).split()
+    return names
@@ -0,0 +1,191 @@
+import json
+import os
+import socket
+from semver.logger import logger
+from semver import refs
+
+# `semver serve` keeps the parsed config, the tags and the branch classifier of
+# one repository in memory and answers version queries over a Unix socket.
+#
+# The protocol is one JSON object per line in each direction:
+#
+#   {"command": "get_version", "build": 3, "format": "npm", "dot": false}
+#   {"version": "1.3.0-feature-x.3"}
+#
+#   {"command": "predict_bump", "branch": "feature/x"}
+#   {"branch": "feature/x", "version_type": "MINOR", "current_version": "1.2.0", "next_version": "1.3.0"}
+#
+# Errors come back as {"error": "<message>"}.
+
+SOCKET_NAME = 'semver.sock'
+
+# Default socket of a repository, inside its git directory
+def default_socket_path(repo_path='.'):
+    git_dirs = refs.find_git_dirs(repo_path)
+    git_dir = git_dirs[0] if git_dirs else os.path.join(repo_path, '.git')
+    return os.path.join(git_dir, SOCKET_NAME)
+
+class RepoState(object):
+    # Warm view of a repository. Every query first compares HEAD and the tag
+    # refs stat data with what was seen last time; a moved HEAD only updates
+    # HEAD, new or deleted tags are applied to the tag map without rescanning
+    # the existing ones. Loose tags whose ref file was rewritten (`git tag -f`)
+    # are resolved again.
+
+    def __init__(self, repo_path='.'):
+        # Only the daemon needs these; query() stays cheap for the thin client
+        import threading
+        from semver import git
+
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.tags_stat = None
+        # {tag name: (inode, mtime)} of the loose tag refs, None for packed ones
+        self.loose_stat = {}
+        # resolves added tags without forking git for each of them
+        self.objects = git.CatFile(repo_path)
+        git_dirs = refs.find_git_dirs(repo_path)
+        self.refs_dir = git_dirs[1] if git_dirs else None
+
+    def refresh(self, tag_name='{new_version}'):
+        from semver.snapshot import RepoSnapshot
+
+        head = refs.read_head(self.repo_path)
+        tags_stat = refs.tag_refs_stat(self.refs_dir, tag_name) if self.refs_dir else None
+        if self.snapshot is None or head is None or tags_stat is None:
+            logger.debug("Loading repository state")
+            self.snapshot = RepoSnapshot.load_refs(self.repo_path)
+            self.loose_stat = self._loose_stat(self.snapshot.tags) if self.refs_dir else {}
+        elif tags_stat != self.tags_stat:
+            self._update_tags()
+        if head is not None:
+            self.snapshot.head, self.snapshot.branch = head
+        self.tags_stat = tags_stat
+        return self.snapshot
+
+    def _loose_stat(self, names):
+        tags_dir = os.path.join(self.refs_dir, refs.TAGS_DIR)
+        loose_stat = {}
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(tags_dir, *name.split('/')))
+                loose_stat[name] = (stat.st_ino, stat.st_mtime)
+            except OSError:
+                loose_stat[name] = None
+        return loose_stat
+
+    def _update_tags(self):
+        from semver.snapshot import RepoSnapshot
+
+        names = refs.read_tag_names(self.repo_path)
+        tags = self.snapshot.tags
+        if names is None:
+            self.snapshot.tags = RepoSnapshot.load_refs(self.repo_path).tags
+            self.loose_stat = {}
+            return
+
+        for name in set(tags) - names:
+            del tags[name]
+        loose_stat = self._loose_stat(names)
+        # git writes a ref to a lock file and renames it into place, so a moved
+        # tag always has a new inode
+        changed = sorted(name for name in names
+                         if name not in tags or loose_stat[name] != self.loose_stat.get(name))
+        self.loose_stat = loose_stat
+        if not changed:
+            return
+        logger.debug("New or moved tags: " + ', '.join(changed))
+        for name in changed:
+            tags[name] = self.objects.resolve('refs/tags/{}^{{commit}}'.format(name))
+
+    def handle(self, request):
+        from semver.config import load_config
+
+        command = request.get('command')
+        with self.lock:
+            config = load_config(self.repo_path)
+            snapshot = self.refresh(config.tag_name)
+            if command == 'get_version':
+                return {'version': self._get_version(snapshot, config, request)}
+            if command == 'predict_bump':
+                return self._predict_bump(snapshot, config, request.get('branch') or snapshot.branch)
+            if command == 'ping':
+                return {'head': snapshot.head, 'branch': snapshot.branch, 'tags': len(snapshot.tags)}
+        return {'error': 'Unknown command: {}'.format(command)}
+
+    def _get_version(self, snapshot, config, request):
+        from semver.get_version import get_version_state, format_version
+
+        state = get_version_state(config, self.repo_path, snapshot=snapshot)
+        return format_version(state, request.get('build', 0), request.get('format'), request.get('dot', False), config)
+
+    def _predict_bump(self, snapshot, config, branch):
+        from semver.branches import BranchClassifier
+        from semver.bump import bump_version
+        from semver.utils import get_tag_version
+
+        # tag_scope applies to the branch asked about. One that doesn't exist
+        # (yet) is taken to start from HEAD.
+        head = None
+        if branch != snapshot.branch:
+            head = self.objects.resolve(branch + '^{commit}') or snapshot.head, branch
+        version = get_tag_version(snapshot=snapshot, config=config, repo_path=self.repo_path, head=head)
+        version_type = BranchClassifier.from_config(config).classify(branch)
+        return {'branch': branch, 'current_version': version,
+                'version_type': version_type.name if version_type is not None else None,
+                'next_version': bump_version(version, version_type, False, False, config) if version_type is not None else None}
+
+# Server answering the protocol above for one repository; serve() runs it
+def make_server(repo_path='.', socket_path=None):
+    import socketserver
+
+    socket_path = socket_path or default_socket_path(repo_path)
+    state = RepoState(repo_path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    response = state.handle(json.loads(line.decode('utf-8')))
+                except Exception as e:
+                    response = {'error': str(e)}
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+def serve(repo_path='.', socket_path=None):
+    server = make_server(repo_path, socket_path)
+    logger.info("Serving versions of {} on {}".format(os.path.abspath(repo_path), server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.state.objects.close()
+        if os.path.exists(server.server_address):
+            os.remove(server.server_address)
+
+# Send one request to a running `semver serve`. Raises OSError (socket.error)
+# when nothing is listening so callers can fall back to computing it themselves.
+def query(request, socket_path=None, repo_path='.', timeout=5.0):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path or default_socket_path(repo_path))
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    finally:
+        client.close()
+    return json.loads(response.decode('utf-8'))
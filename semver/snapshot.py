@@ -0,0 +1,68 @@
+import re
+from semver.logger import logging, logger, console_logger
+from semver.utils import git_output, latest_version
+from semver import refs
+
+# Matches the checked out branch in a `%D` decoration list, e.g. "HEAD -> master, tag: 1.0.0"
+HEAD_DECORATION = re.compile(r'(?:^|, )HEAD -> ([^,]+)')
+
+TAG_REF_PREFIX = 'refs/tags/'
+
+# HEAD sha, decorations (for the branch name) and the full commit message
+LOG_ARGS = ['-c', 'log.showSignature=false', 'log', '-1', '--format=%H%x00%D%x00%B']
+# Every tag with the sha it points at and, for annotated tags, the peeled commit
+TAG_ARGS = ['for-each-ref', '--format=%(refname)%00%(objectname)%00%(*objectname)', TAG_REF_PREFIX]
+
+class RepoSnapshot(object):
+    # Point in time view of everything auto-semver needs to know about a repository.
+    # Gathered with two git processes (one `git log`, one `git for-each-ref`) so that
+    # callers never have to fork git again to answer "what is HEAD" or "where is tag X".
+
+    def __init__(self, head=None, branch='HEAD', message='', tags=None):
+        self.head = head
+        self.branch = branch
+        self.message = message
+        # tag name -> sha of the commit the tag points at (annotated tags are peeled)
+        self.tags = tags if tags is not None else {}
+
+    @classmethod
+    def load(cls, cwd='.'):
+        return cls.parse(git_output(LOG_ARGS, cwd=cwd), git_output(TAG_ARGS, cwd=cwd))
+
+    # Snapshot without the commit message for callers that don't need it. HEAD
+    # is read straight from `.git`, so only `git for-each-ref` is run.
+    @classmethod
+    def load_refs(cls, cwd='.'):
+        head = refs.read_head(cwd)
+        if head is None:
+            return cls.load(cwd)
+        snapshot = cls.parse('', git_output(TAG_ARGS, cwd=cwd))
+        snapshot.head, snapshot.branch = head
+        return snapshot
+
+    # Build a snapshot from the output of the LOG_ARGS and TAG_ARGS git commands
+    @classmethod
+    def parse(cls, log_output, tag_output):
+        head, branch, message = None, 'HEAD', ''
+
+        if log_output:
+            head, decorations, message = log_output.split('\0', 2)
+            matches = HEAD_DECORATION.search(decorations)
+            if matches:
+                branch = matches.group(1).strip()
+
+        tags = {}
+        for line in tag_output.splitlines():
+            refname, sha, peeled = line.split('\0')
+            tags[refname[len(TAG_REF_PREFIX):]] = peeled or sha
+
+        logger.debug("Snapshot: HEAD {} on {} with {} tags".format(head, branch, len(tags)))
+        return cls(head, branch, message.rstrip('\n'), tags)
+
+    # commit sha the tag points at, or None if there is no such tag
+    def tag_commit(self, tag):
+        return self.tags.get(tag)
+
+    # highest version tag matching a pattern from `tag_version_pattern()`
+    def latest_tag(self, pattern):
+        return latest_version(self.tags, pattern)
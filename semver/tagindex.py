@@ -0,0 +1,176 @@
+import bisect
+import os
+import struct
+from semver.logger import logging, logger, console_logger
+from semver import refs
+from semver.config import load_config
+
+INDEX_DIR = 'semver'
+INDEX_FILE = 'tag-index'
+
+# major, minor, patch of one version tag
+RECORD = struct.Struct('>QQQ')
+
+class TagIndex(object):
+    # Version tags of a repository kept sorted under `.git/semver/tag-index`:
+    # a JSON header line followed by fixed size (major, minor, patch) records
+    # in ascending order, so the latest version is the last record and
+    # "latest below X" is a binary search over the file.
+    #
+    # The header holds the tag refs stat data the index was built from. When it
+    # no longer matches, the index is reconciled with the current tag names:
+    # only added names are parsed and removed ones dropped. bump_version()
+    # appends the tag it creates directly.
+
+    def __init__(self, cwd='.', config=None):
+        self.cwd = cwd
+        self.config = config if config is not None else load_config(cwd)
+        self.tag_name = self.config.tag_name
+        git_dirs = refs.find_git_dirs(cwd)
+        self.refs_dir = refs.find_refs_dir(cwd) if git_dirs else None
+        self.path = os.path.join(git_dirs[1], INDEX_DIR, INDEX_FILE) if self.refs_dir else None
+
+    def key(self):
+        return refs.tag_refs_stat(self.refs_dir, self.tag_name)
+
+    def pattern(self):
+        from semver.utils import tag_version_pattern
+        return tag_version_pattern(self.tag_name)
+
+    def name(self, version):
+        return self.tag_name.replace('{new_version}', '{}.{}.{}'.format(*version))
+
+    def _read(self):
+        # (header, records offset, record count), or None without a usable index
+        if self.path is None or not os.path.isfile(self.path):
+            return None
+        import json
+        with open(self.path, 'rb') as f:
+            line = f.readline()
+        try:
+            header = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
+        if header.get('tag_name') != self.tag_name:
+            return None
+        return header, len(line), (os.path.getsize(self.path) - len(line)) // RECORD.size
+
+    def current(self):
+        index = self._read()
+        return index is not None and index[0]['key'] == self.key()
+
+    def versions(self):
+        index = self._read()
+        if index is None:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(index[1])
+            data = f.read(index[2] * RECORD.size)
+        return [RECORD.unpack_from(data, i * RECORD.size) for i in range(index[2])]
+
+    def write(self, versions, key=None):
+        if self.path is None:
+            return
+        import json
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        header = {'key': key if key is not None else self.key(), 'tag_name': self.tag_name}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write((json.dumps(header) + '\n').encode('utf-8'))
+            for version in versions:
+                f.write(RECORD.pack(*version))
+        os.replace(tmp_path, self.path)
+
+    def _tag_names(self):
+        from semver.utils import git_output
+
+        names = refs.read_tag_names(self.cwd)
+        if names is None:
+            expression = self.tag_name.replace('{new_version}', '[0-9]*.[0-9]*.[0-9]*')
+            names = set(git_output(['tag', '-l', expression], cwd=self.cwd).split())
+        return names
+
+    # Bring the index in line with the tags. A current index is left alone
+    # without reading its records, so _search() stays O(log n).
+    def update(self):
+        key = self.key()
+        index = self._read()
+        if index is not None and index[0]['key'] == key:
+            return
+
+        pattern = self.pattern()
+        def parse(names):
+            versions = set()
+            for name in names:
+                matches = pattern.match(name)
+                if matches:
+                    versions.add(tuple(int(number) for number in matches.groups()))
+            return versions
+
+        names = self._tag_names()
+        if index is None:
+            logger.debug("Building tag index")
+            versions = parse(names)
+        else:
+            versions = set(self.versions())
+            known = set(self.name(version) for version in versions)
+            # tags spelled differently from name() (e.g. `1.02.0`) always show
+            # up as added, so dropping by name and re-adding by version is safe
+            added, removed = names - known, known - names
+            logger.debug("Tag index: {} added, {} removed".format(len(added), len(removed)))
+            versions = (versions - parse(removed)) | parse(added)
+        self.write(sorted(versions), key)
+
+    # Record a tag bump_version() just created. `was_current` says whether the
+    # index matched the tags right before it; otherwise the next update()
+    # reconciles it.
+    def add(self, name, was_current=True):
+        matches = self.pattern().match(name)
+        if not was_current or not matches:
+            return
+        versions = self.versions()
+        version = tuple(int(number) for number in matches.groups())
+        if version not in versions:
+            bisect.insort(versions, version)
+        self.write(versions)
+
+    def _record(self, f, offset, i):
+        f.seek(offset + i * RECORD.size)
+        return RECORD.unpack(f.read(RECORD.size))
+
+    # Highest indexed version below `version`, or the highest of all. Reads
+    # O(log n) records of the index.
+    def _search(self, version=None):
+        self.update()
+        index = self._read()
+        if index is None or index[2] == 0:
+            return None
+        _, offset, count = index
+        with open(self.path, 'rb') as f:
+            if version is None:
+                return self._record(f, offset, count - 1)
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                if self._record(f, offset, middle) < tuple(version):
+                    low = middle + 1
+                else:
+                    high = middle
+            return self._record(f, offset, low - 1) if low else None
+
+    def latest(self):
+        latest = self._search()
+        return self.name(latest) if latest else None
+
+    # Highest version tag below `version`, a (major, minor, patch) tuple
+    def latest_below(self, version):
+        latest = self._search(version)
+        return self.name(latest) if latest else None
+
+    # Highest version tag on a major (and minor) line, e.g. latest_on_line(1) for 1.x.y
+    def latest_on_line(self, major, minor=None):
+        latest = self._search((major + 1, 0, 0) if minor is None else (major, minor + 1, 0))
+        if latest is None or latest[0] != major or (minor is not None and latest[1] != minor):
+            return None
+        return self.name(latest)
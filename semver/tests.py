@@ -1,7 +1,8 @@
-import unittest, os, subprocess, re, semver
+import unittest, os, subprocess, re, asyncio, threading, semver
 from semver.logger import logging, logger, console_logger
+from semver.config import load_config, VersionTemplate
 
-from semver import bump, get_version, utils, NO_MERGE_FOUND, GET_COMMIT_MESSAGE
+from semver import bump, get_version, utils, snapshot, refs, cache, fleet, aio, globs, branches, timings, benchmark, server, tagindex, scope, lock, git, versions, notes, NO_MERGE_FOUND, GET_COMMIT_MESSAGE
 
 config_data = """
 [bumpversion]
@@ -50,6 +51,30 @@ class TestSemverObject(unittest.TestCase):
             else:
                 self.assertTrue(False)
 
+class TestBranchClassifier(unittest.TestCase):
+    def test_prefix_index(self):
+        classifier = branches.BranchClassifier(['major'], ['feature'], ['hotfix', 'bugfix'])
+        self.assertEqual(classifier.classify('feature/PLAT-185'), semver.VersionType.MINOR)
+        self.assertEqual(classifier.classify('user/hotfix/PLAT-1'), semver.VersionType.PATCH)
+        self.assertEqual(classifier.classify('major'), None)
+        self.assertEqual(classifier.classify('feature'), None)
+        self.assertEqual(classifier.classify('other/feature'), None)
+    def test_prefix_precedence(self):
+        classifier = branches.BranchClassifier(['shared'], ['shared'], ['shared'])
+        self.assertEqual(classifier.classify('shared/x'), semver.VersionType.MAJOR)
+    def test_rules(self):
+        classifier = branches.BranchClassifier(minor_branches=['feature'], minor_rules=['release/*'],
+                                               patch_rules=['re:JIRA-\\d+'])
+        self.assertEqual(classifier.classify('release/2.x'), semver.VersionType.MINOR)
+        self.assertEqual(classifier.classify('JIRA-42-fix-login'), semver.VersionType.PATCH)
+        self.assertEqual(classifier.classify('JIRA-fix'), None)
+    def test_classify_branches(self):
+        result = semver.SemVer().classify_branches(['major/a', 'minor/b', 'patch/c', 'master', 'minor/b'])
+        self.assertEqual(list(result.items()), [('major/a', semver.VersionType.MAJOR),
+                                                ('minor/b', semver.VersionType.MINOR),
+                                                ('patch/c', semver.VersionType.PATCH),
+                                                ('master', None)])
+
 class TestGetVersion(unittest.TestCase):
     def test_get_branch_version(self):
         create_git_environment()
@@ -85,6 +110,40 @@ class TestGetVersion(unittest.TestCase):
         subprocess.call(['git', 'checkout', '-b', 'test/branch'])
         branch = get_version.get_version(version_format='maven')
         self.assertEqual(branch, "test/branch")
+    def test_all_branch_versions(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '1.0.0'])
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', 'second commit'])
+        subprocess.call(['git', 'branch', 'minor/branch'])
+        subprocess.call(['git', 'branch', 'test/branch'])
+        subprocess.call(['git', 'branch', 'released', '1.0.0'])
+        subprocess.call(['git', 'update-ref', 'refs/remotes/origin/patch/remote', 'HEAD'])
+        report = get_version.get_all_branch_versions(version_format='npm')
+        versions = dict((row['branch'], row['version']) for row in report)
+        self.assertEqual(versions, {'master': 'master', 'minor/branch': '1.1.0-minor-branch.0',
+                                    'released': '1.0.0', 'test/branch': 'test/branch',
+                                    'origin/patch/remote': '1.0.1-patch-remote.0'})
+        self.assertEqual([row['next_version'] for row in report if row['branch'] == 'minor/branch'], ['1.1.0'])
+    def test_get_version_lazy_imports(self):
+        # `re` imports `enum` itself on Python 3.6+, only what semver adds counts
+        code = ("import sys, re; before = set(sys.modules); import semver.get_version; "
+                "print(','.join(m for m in ('logging', 'argparse', 'concurrent.futures', 'hashlib', 'enum', 'configparser', "
+                "'threading', 'subprocess', 'semver.branches', 'semver.bump', 'semver.git', 'semver.utils', "
+                "'semver.config', 'semver.snapshot', 'semver.cache', 'semver.scope') "
+                "if m in sys.modules and m not in before))")
+        val = subprocess.Popen(['python', '-c', code], stdout=subprocess.PIPE,
+                               cwd='.').stdout.read().decode('utf-8').rstrip()
+        self.assertEqual(val, "")
+    def test_thin_client_imports(self):
+        # `semver_get_version --server` only needs the socket client
+        code = ("import sys, re; before = set(sys.modules); import semver.get_version; "
+                "from semver.server import query; "
+                "print(','.join(m for m in ('threading', 'subprocess', 'socketserver', 'semver.git', "
+                "'semver.utils', 'semver.config', 'semver.snapshot') "
+                "if m in sys.modules and m not in before))")
+        val = subprocess.Popen(['python', '-c', code], stdout=subprocess.PIPE,
+                               cwd='.').stdout.read().decode('utf-8').rstrip()
+        self.assertEqual(val, "")
     def test_get_version_run(self):
         create_git_environment()
         val = subprocess.Popen(['python', '../get_version.py', '-d'], stdout=subprocess.PIPE,
@@ -127,11 +186,697 @@ class TestGetTagVersion(unittest.TestCase):
         subprocess.call(['git', 'tag', '0.2.1'])
         tag = utils.get_tag_version()
         self.assertEqual(tag, "8.1.0")
+    def test_get_version_ignores_invalid(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '1.2.0'])
+        subprocess.call(['git', 'tag', '1.2.3rc'])
+        subprocess.call(['git', 'tag', '1.10.0-beta'])
+        tag = utils.get_tag_version()
+        self.assertEqual(tag, "1.2.0")
+    def test_latest_version_prefixed_tag_name(self):
+        pattern = utils.tag_version_pattern('v{new_version}')
+        tags = ['v1.9.0', 'v1.10.0', 'v1.10.0rc1', '1.11.0', 'v2.0', 'release-v3.0.0']
+        self.assertEqual(utils.latest_version(tags, pattern), 'v1.10.0')
+        self.assertEqual(utils.latest_version([], pattern), None)
     def test_default_get_version_tag(self):
         create_git_environment()
         tag = utils.get_tag_version()
         self.assertEqual(tag, "0.0.0")
         
+class TestRepoSnapshot(unittest.TestCase):
+    def test_snapshot_head_and_branch(self):
+        create_git_environment()
+        head = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                                cwd='.').stdout.read().decode('utf-8').rstrip()
+        repo = snapshot.RepoSnapshot.load()
+        self.assertEqual(repo.head, head)
+        self.assertEqual(repo.branch, "master")
+        self.assertEqual(repo.message, "file.txt")
+    def test_snapshot_detached_head(self):
+        create_git_environment()
+        subprocess.call(['git', 'checkout', '--detach'])
+        repo = snapshot.RepoSnapshot.load()
+        self.assertEqual(repo.branch, "HEAD")
+    def test_snapshot_peels_annotated_tags(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.1.0'])
+        subprocess.call(['git', 'tag', '-a', '0.2.0', '-m', 'annotated'])
+        repo = snapshot.RepoSnapshot.load()
+        self.assertEqual(repo.tag_commit('0.1.0'), repo.head)
+        self.assertEqual(repo.tag_commit('0.2.0'), repo.head)
+        self.assertEqual(repo.tag_commit('9.9.9'), None)
+        self.assertEqual(repo.latest_tag(utils.tag_version_pattern('{new_version}')), '0.2.0')
+    def test_snapshot_load_refs(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.1.0'])
+        repo = snapshot.RepoSnapshot.load_refs()
+        full = snapshot.RepoSnapshot.load()
+        self.assertEqual((repo.head, repo.branch, repo.tags), (full.head, full.branch, full.tags))
+    def test_snapshot_load_refs_packed(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.1.0'])
+        subprocess.call(['git', 'checkout', '-q', '-b', 'minor/x'])
+        subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'])
+        subprocess.call(['git', 'pack-refs', '--all'])
+        repo = snapshot.RepoSnapshot.load_refs()
+        full = snapshot.RepoSnapshot.load()
+        self.assertEqual((repo.head, repo.branch, repo.tags), (full.head, full.branch, full.tags))
+        self.assertEqual(get_version.get_version(version_format='npm'), "0.2.0-minor-x.0")
+    def test_snapshot_merge_branches(self):
+        create_git_environment()
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', "Merge branch 'minor/unittest' into 'master'"])
+        semver_object = semver.SemVer()
+        self.assertTrue(semver_object.get_branches())
+        self.assertEqual(semver_object.merged_branch, "minor/unittest")
+        self.assertEqual(semver_object.main_branch, "master")
+
+class TestRefReader(unittest.TestCase):
+    def test_read_loose_and_packed_tags(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.1.0'])
+        subprocess.call(['git', 'tag', '-a', '0.2.0', '-m', 'annotated'])
+        subprocess.call(['git', 'pack-refs', '--all'])
+        subprocess.call(['git', 'tag', '0.10.0'])
+        subprocess.call(['git', 'tag', 'release/1.0.0'])
+        self.assertEqual(refs.read_tag_names(), set(['0.1.0', '0.2.0', '0.10.0', 'release/1.0.0']))
+    def test_latest_version_from_refs(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.9.0'])
+        subprocess.call(['git', 'pack-refs', '--all'])
+        subprocess.call(['git', 'tag', '0.10.0'])
+        tag = utils.latest_version(refs.read_tag_names(), utils.tag_version_pattern('{new_version}'))
+        self.assertEqual(tag, "0.10.0")
+    def test_read_head_packed(self):
+        create_git_environment()
+        subprocess.call(['git', 'checkout', '-q', '-b', 'minor/packed'])
+        subprocess.call(['git', 'pack-refs', '--all'])
+        head = git.output(['rev-parse', 'HEAD']).strip()
+        self.assertFalse(os.path.isfile('.git/refs/heads/minor/packed'))
+        self.assertEqual(refs.read_head(), (head, 'minor/packed'))
+    def test_shallow_falls_back(self):
+        create_git_environment()
+        open('.git/shallow', 'w').close()
+        self.assertEqual(refs.read_tag_names(), None)
+        os.remove('.git/shallow')
+
+class TestTagIndex(unittest.TestCase):
+    def test_index_lookups(self):
+        create_git_environment()
+        for tag in ['0.9.0', '1.0.0', '1.2.0', '1.10.1', '2.0.0', '2.1.0rc', 'other']:
+            subprocess.call(['git', 'tag', tag])
+        index = tagindex.TagIndex()
+        self.assertEqual(index.latest(), '2.0.0')
+        self.assertTrue(os.path.isfile(index.path))
+        self.assertEqual(index.latest_below((1, 10, 1)), '1.2.0')
+        self.assertEqual(index.latest_below((0, 9, 0)), None)
+        self.assertEqual(index.latest_on_line(1), '1.10.1')
+        self.assertEqual(index.latest_on_line(1, 2), '1.2.0')
+        self.assertEqual(index.latest_on_line(3), None)
+    def test_index_reconciles_tags(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '1.0.0'])
+        index = tagindex.TagIndex()
+        self.assertEqual(index.latest(), '1.0.0')
+        subprocess.call(['git', 'tag', '1.1.0'])
+        subprocess.call(['git', 'pack-refs', '--all'])
+        self.assertFalse(index.current())
+        self.assertEqual(index.latest(), '1.1.0')
+        subprocess.call(['git', 'tag', '-d', '1.1.0'])
+        self.assertEqual(index.versions(), [(1, 0, 0), (1, 1, 0)])
+        self.assertEqual(index.latest(), '1.0.0')
+    def test_current_index_skips_records(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '1.0.0'])
+        index = tagindex.TagIndex()
+        index.update()
+        def versions():
+            raise AssertionError("read every record of a current index")
+        index.versions = versions
+        self.assertEqual(index.latest(), '1.0.0')
+    def test_bump_updates_index(self):
+        create_git_environment()
+        index = tagindex.TagIndex()
+        index.update()
+        bump.bump_version("0.0.0", semver.VersionType.MINOR, True, False)
+        self.assertTrue(index.current())
+        self.assertEqual(index.versions(), [(0, 1, 0)])
+    def test_get_tag_version_with_index(self):
+        subprocess.call(['rm', '-rf', 'indexed'])
+        create_repo('indexed', config=config_data + "tag_index = true\n")
+        subprocess.call(['git', 'tag', '0.9.0'], cwd='indexed')
+        subprocess.call(['git', 'tag', '0.10.0'], cwd='indexed')
+        self.assertEqual(utils.get_tag_version(repo_path='indexed'), "0.10.0")
+        self.assertTrue(os.path.isfile('indexed/.git/semver/tag-index'))
+        subprocess.call(['rm', '-rf', 'indexed'])
+    def test_get_version_with_index(self):
+        subprocess.call(['rm', '-rf', 'indexed'])
+        create_repo('indexed', config=config_data + "tag_index = true\n")
+        subprocess.call(['git', 'tag', '0.9.0'], cwd='indexed')
+        events = []
+        timings.add_hook(events.append)
+        try:
+            self.assertEqual(get_version.get_version(repo_path='indexed'), "0.9.0")
+            subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'], cwd='indexed')
+            subprocess.call(['git', 'tag', '-a', '-m', 'annotated', '0.10.0'], cwd='indexed')
+            self.assertEqual(get_version.get_version(repo_path='indexed'), "0.10.0")
+            subprocess.call(['git', 'checkout', '-q', '-b', 'minor/x'], cwd='indexed')
+            subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'], cwd='indexed')
+            self.assertEqual(get_version.get_version(version_format='npm', repo_path='indexed'), "0.11.0-minor-x.0")
+        finally:
+            timings.remove_hook(events.append)
+        self.assertFalse([event['name'] for event in events if 'for-each-ref' in event['name']])
+        subprocess.call(['rm', '-rf', 'indexed'])
+
+class TestMergeRange(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'range'])
+        create_repo('range')
+        self.git('tag', '0.1.0')
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'range'])
+    def git(self, *args):
+        subprocess.call(['git'] + list(args), cwd='range')
+    def merge(self, branch):
+        self.git('checkout', '-q', '-b', branch)
+        self.git('commit', '-q', '--allow-empty', '-m', 'work on ' + branch)
+        self.git('checkout', '-q', 'master')
+        self.git('merge', '-q', '--no-ff', branch, '-m', "Merge branch '{}' into 'master'".format(branch))
+    def test_range_takes_biggest_bump(self):
+        self.merge('patch/one')
+        self.merge('minor/two')
+        self.merge('patch/three')
+        semver_object = semver.SemVer(repo_path='range', since=semver.LAST_TAG).run(False)
+        self.assertEqual(semver_object.merge_count, 3)
+        self.assertEqual(semver_object.merged_branch, 'minor/two')
+        self.assertEqual(semver_object.new_version, '0.2.0')
+        self.assertEqual(utils.get_tag_version(repo_path='range'), '0.2.0')
+    def test_range_since_ref(self):
+        self.merge('major/one')
+        self.git('tag', 'checkpoint')
+        self.merge('patch/two')
+        semver_object = semver.SemVer(repo_path='range', since='checkpoint')
+        self.assertTrue(semver_object.get_branches())
+        self.assertEqual((semver_object.merge_count, semver_object.merged_branch), (1, 'patch/two'))
+    def test_range_without_merges(self):
+        with self.assertRaises(Exception) as error:
+            semver.SemVer(repo_path='range', since=semver.LAST_TAG).run(False)
+        self.assertEqual(error.exception, NO_MERGE_FOUND)
+
+class TestPush(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'push'])
+        create_repo('push/work')
+        subprocess.call(['git', 'init', '-q', '--bare', 'push/remote.git'])
+        self.git('remote', 'add', 'origin', '../remote.git')
+        self.git('push', '-q', 'origin', 'master')
+        self.retry_delay, semver.PUSH_RETRY_DELAY = semver.PUSH_RETRY_DELAY, 0
+    def tearDown(self):
+        semver.PUSH_RETRY_DELAY = self.retry_delay
+        subprocess.call(['rm', '-rf', 'push'])
+    def git(self, *args, **kwargs):
+        return subprocess.Popen(['git'] + list(args), cwd=kwargs.get('cwd', 'push/work'),
+                                stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
+    def version(self, tag):
+        self.git('tag', tag)
+        semver_object = semver.SemVer(repo_path='push/work')
+        semver_object.main_branch, semver_object.new_version = 'master', tag
+        return semver_object
+    def remote_commit(self):
+        subprocess.call(['git', 'clone', '-q', 'push/remote.git', 'push/other'])
+        self.git('commit', '-q', '--allow-empty', '-m', 'other', cwd='push/other')
+        self.git('push', '-q', 'origin', 'master', cwd='push/other')
+    def test_push_only_new_tag(self):
+        self.git('tag', 'unrelated')
+        self.version('0.1.0').commit_and_push()
+        self.assertEqual(self.git('tag', cwd='push/remote.git').split(), ['0.1.0'])
+    def test_push_retries_when_remote_moved(self):
+        self.remote_commit()
+        self.version('0.1.0').commit_and_push()
+        self.assertEqual(self.git('tag', cwd='push/remote.git').split(), ['0.1.0'])
+        self.assertEqual(self.git('log', '-1', '--format=%s', 'master', cwd='push/remote.git').strip(), 'other')
+    def test_push_versions_again_when_tag_taken(self):
+        self.remote_commit()
+        self.git('tag', '0.1.0', cwd='push/other')
+        self.git('push', '-q', 'origin', '0.1.0', cwd='push/other')
+        semver_object = self.version('0.1.0')
+        semver_object.version_type = semver.VersionType.MINOR
+        semver_object.commit_and_push()
+        self.assertEqual(semver_object.new_version, '0.2.0')
+        self.assertEqual(self.git('tag', cwd='push/remote.git').split(), ['0.1.0', '0.2.0'])
+        self.assertEqual(self.git('rev-parse', '0.2.0^{commit}', cwd='push/remote.git'), self.git('rev-parse', 'HEAD'))
+    def test_note_records_version_after_tag_taken(self):
+        subprocess.call(['git', 'clone', '-q', 'push/remote.git', 'push/other'])
+        self.git('tag', '0.1.0', cwd='push/other')
+        self.git('push', '-q', 'origin', '0.1.0', cwd='push/other')
+        self.git('commit', '-q', '--allow-empty', '-m', "Merge branch 'minor/x' into 'master'")
+        semver_object = semver.SemVer(global_user=True, repo_path='push/work', notes=True).run()
+        self.assertEqual(semver_object.new_version, '0.2.0')
+        note = notes.read_note(self.git('rev-parse', 'HEAD').strip(), repo_path='push/remote.git')
+        self.assertEqual((note['version'], note['previous_version']), ('0.2.0', '0.1.0'))
+    def note(self, repo, version):
+        head = self.git('rev-parse', 'HEAD', cwd=repo).strip()
+        notes.fetch_notes(repo)
+        notes.write_note(head, {'version': version}, repo)
+        return head
+    def test_notes_fetched_before_writing(self):
+        subprocess.call(['git', 'clone', '-q', 'push/remote.git', 'push/other'])
+        first = self.note('push/work', '0.1.0')
+        self.assertTrue(notes.push_notes('push/work'))
+        self.git('commit', '-q', '--allow-empty', '-m', 'other', cwd='push/other')
+        second = self.note('push/other', '0.2.0')
+        self.assertTrue(notes.push_notes('push/other'))
+        self.assertEqual(notes.read_note(first, repo_path='push/remote.git'), {'version': '0.1.0'})
+        self.assertEqual(notes.read_note(second, repo_path='push/remote.git'), {'version': '0.2.0'})
+    def test_rejected_notes_push_merges(self):
+        subprocess.call(['git', 'clone', '-q', 'push/remote.git', 'push/other'])
+        self.git('commit', '-q', '--allow-empty', '-m', 'other', cwd='push/other')
+        first = self.note('push/work', '0.1.0')
+        second = self.note('push/other', '0.2.0')
+        self.assertTrue(notes.push_notes('push/work'))
+        # other wrote its note before the first push, so its push is rejected
+        self.assertTrue(notes.push_notes('push/other'))
+        self.assertEqual(notes.read_note(first, repo_path='push/remote.git'), {'version': '0.1.0'})
+        self.assertEqual(notes.read_note(second, repo_path='push/remote.git'), {'version': '0.2.0'})
+    def test_push_fails_when_diverged(self):
+        self.remote_commit()
+        self.git('commit', '-q', '--allow-empty', '-m', 'local')
+        with self.assertRaises(Exception) as error:
+            self.version('0.1.0').commit_and_push()
+        self.assertEqual(semver.get_exit_code(error.exception), 4)
+        self.assertEqual(self.git('tag', cwd='push/remote.git').split(), [])
+
+class TestGitRunner(unittest.TestCase):
+    def test_check_raises(self):
+        create_git_environment()
+        self.assertEqual(git.output(['rev-parse', 'no-such-ref']), '')
+        with self.assertRaises(git.GitError) as error:
+            git.run(['rev-parse', '--verify', 'no-such-ref'], check=True)
+        self.assertEqual(error.exception.returncode, 128)
+        self.assertTrue(error.exception.stderr)
+    def test_stream_reaps_abandoned_process(self):
+        create_git_environment()
+        for i in range(3):
+            subprocess.call(['git', 'tag', 'stream-{}'.format(i)])
+        events = []
+        timings.add_hook(events.append)
+        try:
+            names = git.stream(['tag', '-l', 'stream-*'])
+            self.assertEqual(next(names), 'stream-0')
+            names.close()
+        finally:
+            timings.remove_hook(events.append)
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0]['returncode'] is not None)
+    def test_timeout_kills(self):
+        create_git_environment()
+        returncode, output = git.run(['-c', 'alias.wait=!sleep 1', 'wait'], timeout=0.2)
+        self.assertNotEqual(returncode, 0)
+    def test_run_many_keeps_order(self):
+        create_git_environment()
+        results = git.run_many([['rev-parse', 'HEAD'], ['rev-parse', '--abbrev-ref', 'HEAD']], workers=2)
+        self.assertEqual([output.strip() for _, output in results][1], 'master')
+    def test_cat_file(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '-a', '0.5.0', '-m', 'annotated'])
+        head = git.output(['rev-parse', 'HEAD']).strip()
+        with git.CatFile() as objects:
+            self.assertEqual(objects.resolve('refs/tags/0.5.0^{commit}'), head)
+            self.assertEqual(objects.read('refs/tags/0.5.0')[1], 'tag')
+            self.assertEqual(objects.resolve('refs/tags/missing'), None)
+            self.assertEqual(objects.resolve('HEAD'), head)
+
+class TestPlumbing(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'plumb'])
+        create_repo('plumb/src')
+        self.git('tag', '0.1.0', cwd='plumb/src')
+        self.git('commit', '-q', '--allow-empty', '-m', 'more work', cwd='plumb/src')
+        self.git('commit', '-q', '--allow-empty', '-m', "Merge branch 'patch/fix' into 'master'", cwd='plumb/src')
+        self.git('clone', '-q', '--bare', 'plumb/src', 'plumb/remote.git', cwd='.')
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'plumb'])
+    def git(self, *args, **kwargs):
+        return subprocess.Popen(['git'] + list(args), cwd=kwargs.get('cwd', '.'),
+                                stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
+    def test_bare_mirror(self):
+        semver_object = semver.SemVer(repo_path='plumb/remote.git', plumbing=True).run(False)
+        self.assertEqual((semver_object.main_branch, semver_object.new_version), ('master', '0.1.1'))
+        self.assertEqual(self.git('rev-parse', '0.1.1', cwd='plumb/remote.git'),
+                         self.git('rev-parse', 'master', cwd='plumb/remote.git'))
+    def test_shallow_clone_reads_remote_tags(self):
+        self.git('clone', '-q', '--depth=1', 'file://' + os.path.abspath('plumb/remote.git'), 'plumb/shallow')
+        self.assertEqual(self.git('tag', cwd='plumb/shallow'), '')
+        semver_object = semver.SemVer(repo_path='plumb/shallow', plumbing=True).run(False)
+        self.assertEqual((semver_object.current_version, semver_object.new_version), ('0.1.0', '0.1.1'))
+        semver_object.commit_and_push()
+        self.assertEqual(self.git('tag', cwd='plumb/remote.git').split(), ['0.1.0', '0.1.1'])
+        self.assertEqual(self.git('rev-parse', 'HEAD', cwd='plumb/shallow'),
+                         self.git('rev-parse', '0.1.1', cwd='plumb/remote.git'))
+
+class TestTagLocking(unittest.TestCase):
+    def test_existing_tag_fails(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.0.1'])
+        with self.assertRaises(Exception) as error:
+            bump.bump_version("0.0.0", semver.VersionType.PATCH, True, False)
+        self.assertEqual(semver.get_exit_code(error.exception), 5)
+    def test_version_repo_rereads_tags(self):
+        create_git_environment()
+        stale = snapshot.RepoSnapshot.load()
+        subprocess.call(['git', 'tag', '0.1.0'])
+        semver_object = semver.SemVer(snapshot=stale)
+        semver_object.version_type = semver.VersionType.MINOR
+        semver_object.version_repo()
+        self.assertEqual((semver_object.current_version, semver_object.new_version), ('0.1.0', '0.2.0'))
+    def test_lock_is_exclusive(self):
+        create_git_environment()
+        with lock.RepoLock():
+            with self.assertRaises(Exception) as error:
+                with lock.RepoLock(timeout=0.2):
+                    pass
+            self.assertEqual(error.exception, lock.LOCKED)
+        with lock.RepoLock(timeout=0.2):
+            pass
+
+class TestTagScope(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'scoped'])
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'scoped'])
+    def git(self, *args):
+        subprocess.call(['git'] + list(args), cwd='scoped')
+    def create_lines(self, tag_scope):
+        create_repo('scoped', config=config_data + "tag_scope = {}\n".format(tag_scope))
+        self.git('tag', '1.0.0')
+        self.git('branch', 'release/1.x')
+        self.git('commit', '-q', '--allow-empty', '-m', 'three')
+        self.git('tag', '3.0.0')
+        self.git('checkout', '-q', 'release/1.x')
+        self.git('commit', '-q', '--allow-empty', '-m', 'hotfix')
+    def test_branch_line(self):
+        self.assertEqual(scope.branch_line('release/1.x'), (1,))
+        self.assertEqual(scope.branch_line('support/v2.3.x'), (2, 3))
+        self.assertEqual(scope.branch_line('master'), None)
+    def test_line_scope(self):
+        self.create_lines('line')
+        self.git('tag', '1.1.0', 'master')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "1.1.0")
+        self.git('checkout', '-q', 'master')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "3.0.0")
+    def test_ancestry_scope(self):
+        self.create_lines('ancestry')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "1.0.0")
+        self.assertTrue(os.path.isfile('scoped/.git/' + scope.REACHABLE_FILE))
+        self.git('checkout', '-q', '-b', 'patch/fix')
+        self.assertEqual(get_version.get_version(version_format='npm', repo_path='scoped'), "1.0.1-patch-fix.0")
+        self.git('checkout', '-q', 'master')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "3.0.0")
+    def test_ancestry_cache_sees_prefixed_tags(self):
+        create_repo('scoped', config=config_data.replace('tag_name = {new_version}', 'tag_name = release/{new_version}')
+                    + "tag_scope = ancestry\n")
+        self.git('tag', 'release/1.0.0')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "release/1.0.0")
+        self.git('tag', 'release/1.1.0')
+        self.assertEqual(utils.get_tag_version(repo_path='scoped'), "release/1.1.0")
+    def test_scoped_branch_report(self):
+        self.create_lines('ancestry')
+        self.git('checkout', '-q', '-b', 'patch/fix')
+        self.git('checkout', '-q', 'master')
+        report = dict((row['branch'], row) for row in get_version.get_all_branch_versions(repo_path='scoped'))
+        self.assertEqual(report['patch/fix']['next_version'], '1.0.1')
+        self.assertEqual(report['master']['version'], '3.0.0')
+    def test_scoped_predict_bump(self):
+        self.create_lines('line')
+        self.git('checkout', '-q', 'master')
+        state = server.RepoState('scoped')
+        try:
+            self.assertEqual(state.handle({'command': 'predict_bump', 'branch': 'release/1.x'})['current_version'], '1.0.0')
+            self.assertEqual(state.handle({'command': 'predict_bump'})['current_version'], '3.0.0')
+        finally:
+            state.objects.close()
+    def test_scoped_async_get_version(self):
+        self.create_lines('ancestry')
+        self.git('checkout', '-q', '-b', 'patch/fix')
+        loop = asyncio.new_event_loop()
+        try:
+            version = loop.run_until_complete(aio.get_version(version_format='npm', repo_path='scoped'))
+        finally:
+            loop.close()
+        self.assertEqual(version, "1.0.1-patch-fix.0")
+
+class TestVersionCache(unittest.TestCase):
+    def test_cache_round_trip(self):
+        create_git_environment()
+        version_cache = cache.VersionCache()
+        state = {'version': '1.0.0', 'branch': 'master', 'tagged': True, 'version_type': None}
+        version_cache.store(state)
+        self.assertEqual(version_cache.load(), state)
+    def test_cache_stale_after_commit(self):
+        create_git_environment()
+        version_cache = cache.VersionCache()
+        version_cache.store({'version': '1.0.0', 'branch': 'master', 'tagged': True, 'version_type': None})
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', 'another commit'])
+        self.assertEqual(version_cache.load(), None)
+    def test_cached_get_version(self):
+        create_git_environment()
+        subprocess.call(['git', 'checkout', '-b', 'patch/branch'])
+        self.assertEqual(get_version.get_version(version_format='npm', cache=True), "0.0.1-patch-branch.0")
+        self.assertTrue(os.path.isfile('.git/' + cache.CACHE_FILE))
+        self.assertEqual(get_version.get_version(build=3, version_format='npm', cache=True), "0.0.1-patch-branch.3")
+    def test_bump_invalidates_cache(self):
+        create_git_environment()
+        get_version.get_version(cache=True)
+        bump.bump_version("0.0.0", semver.VersionType.PATCH, True, False)
+        self.assertFalse(os.path.isfile('.git/' + cache.CACHE_FILE))
+        self.assertEqual(get_version.get_version(cache=True), "0.0.1")
+    def test_cache_sees_prefixed_tags(self):
+        subprocess.call(['rm', '-rf', 'prefixed'])
+        create_repo('prefixed', config=config_data.replace('tag_name = {new_version}', 'tag_name = release/{new_version}'))
+        subprocess.call(['git', 'tag', 'release/1.0.0'], cwd='prefixed')
+        subprocess.call(['git', 'checkout', '-q', '-b', 'minor/x'], cwd='prefixed')
+        subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'], cwd='prefixed')
+        self.assertEqual(get_version.get_version(version_format='npm', cache=True, repo_path='prefixed'), "release/1.1.0-minor-x.0")
+        # only refs/tags/release changes
+        subprocess.call(['git', 'tag', 'release/1.5.0'], cwd='prefixed')
+        self.assertEqual(get_version.get_version(version_format='npm', cache=True, repo_path='prefixed'), "release/1.5.0")
+        subprocess.call(['rm', '-rf', 'prefixed'])
+
+class TestConfig(unittest.TestCase):
+    def test_config_values(self):
+        cfg = load_config()
+        self.assertEqual(cfg.tag_name, "{new_version}")
+        self.assertEqual(cfg.main_branches, ("master",))
+        self.assertEqual(cfg.patch_branches, ("patch",))
+        self.assertEqual([target.path for target in cfg.files], ["file.txt"])
+    def test_config_loaded_once(self):
+        self.assertTrue(load_config() is load_config())
+    def test_config_immutable(self):
+        cfg = load_config()
+        with self.assertRaises(AttributeError):
+            cfg.tag_name = "v{new_version}"
+    def test_version_template(self):
+        template = VersionTemplate("version = '{current_version}' -> {new_version}")
+        self.assertEqual(template.render("1.1.0", "1.0.0"), "version = '1.0.0' -> 1.1.0")
+
+class TestRepoPath(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'fleet'])
+        for name, branch in (('a', 'minor/one'), ('b', 'patch/two'), ('c', None)):
+            create_repo(os.path.join('fleet', name), branch)
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'fleet'])
+    def test_get_version_repo_path(self):
+        subprocess.call(['git', 'checkout', '-q', '-b', 'patch/branch'], cwd='fleet/a')
+        self.assertEqual(get_version.get_version(version_format='npm', repo_path='fleet/a'), "0.0.1-patch-branch.0")
+    def test_semver_repo_path(self):
+        semver_object = semver.SemVer(repo_path='fleet/a').run(False)
+        self.assertEqual(semver_object.new_version, "0.1.0")
+        self.assertEqual(utils.get_tag_version(repo_path='fleet/a'), "0.1.0")
+        self.assertEqual(utils.get_tag_version(repo_path='fleet/b'), "0.0.0")
+    def test_version_repos(self):
+        results = fleet.version_repos(fleet.expand_repos(['fleet/*']), workers=2, push=False)
+        self.assertEqual([result['repo'] for result in results], ['fleet/a', 'fleet/b', 'fleet/c'])
+        self.assertEqual([result['new_version'] for result in results], ['0.1.0', '0.0.1', None])
+        self.assertEqual([result['status'] for result in results], [0, 0, 1])
+    def test_version_repos_global_user_once(self):
+        events = []
+        home = os.environ.get('HOME')
+        os.environ['HOME'] = os.path.abspath('fleet')
+        timings.add_hook(events.append)
+        try:
+            fleet.version_repos(fleet.expand_repos(['fleet/*']), workers=3, push=True)
+        finally:
+            timings.remove_hook(events.append)
+            if home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = home
+        self.assertEqual(len([event for event in events if event['name'].startswith('git config --global user.email')]), 1)
+
+class TestAsyncGit(unittest.TestCase):
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+    def test_async_get_version(self):
+        create_git_environment()
+        subprocess.call(['git', 'checkout', '-b', 'minor/branch'])
+        self.assertEqual(self.run_async(aio.get_version(version_format='maven')), "0.1.0-minor-branch-SNAPSHOT")
+    def test_async_get_tag_version(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '0.9.0'])
+        subprocess.call(['git', 'tag', '0.10.0'])
+        self.assertEqual(self.run_async(aio.get_tag_version()), "0.10.0")
+    def test_async_get_branches(self):
+        create_git_environment()
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', "Merge branch 'patch/unittest' into 'master'"])
+        semver_object = semver.SemVer()
+        self.assertTrue(self.run_async(aio.get_branches(semver_object)))
+        self.assertEqual(semver_object.merged_branch, "patch/unittest")
+
+class TestVersionServer(unittest.TestCase):
+    def setUp(self):
+        self.socket_path = os.path.abspath('semver-test.sock')
+        self.server = server.make_server(socket_path=self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server.state.objects.close()
+        self.thread.join()
+        os.remove(self.socket_path)
+    def query(self, **request):
+        return server.query(request, socket_path=self.socket_path)
+    def test_server_get_version(self):
+        create_git_environment()
+        subprocess.call(['git', 'checkout', '-b', 'minor/branch'])
+        self.assertEqual(self.query(command='get_version', build=2, format='npm'), {'version': "0.1.0-minor-branch.2"})
+        self.assertEqual(get_version.get_server_version(2, 'npm', socket_path=self.socket_path), "0.1.0-minor-branch.2")
+    def test_server_sees_new_tags(self):
+        create_git_environment()
+        self.assertEqual(self.query(command='get_version'), {'version': "master"})
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', 'another commit'])
+        subprocess.call(['git', 'tag', '0.3.0'])
+        self.assertEqual(self.query(command='get_version'), {'version': "0.3.0"})
+        subprocess.call(['git', 'tag', '-d', '0.3.0'])
+        self.assertEqual(self.query(command='ping')['tags'], 0)
+    def test_server_sees_prefixed_and_moved_tags(self):
+        subprocess.call(['rm', '-rf', 'served'])
+        create_repo('served', config=config_data.replace('tag_name = {new_version}', 'tag_name = release/{new_version}'))
+        subprocess.call(['git', 'tag', 'release/1.0.0'], cwd='served')
+        subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'], cwd='served')
+        state = server.RepoState('served')
+        try:
+            self.assertEqual(state.handle({'command': 'get_version'}), {'version': 'master'})
+            subprocess.call(['git', 'tag', 'release/1.1.0'], cwd='served')
+            self.assertEqual(state.handle({'command': 'get_version'}), {'version': 'release/1.1.0'})
+            subprocess.call(['git', 'tag', '-f', 'release/1.1.0', 'HEAD~1'], cwd='served')
+            self.assertEqual(state.handle({'command': 'get_version'}), {'version': 'master'})
+        finally:
+            state.objects.close()
+            subprocess.call(['rm', '-rf', 'served'])
+    def test_server_predict_bump(self):
+        create_git_environment()
+        subprocess.call(['git', 'tag', '1.2.0'])
+        response = self.query(command='predict_bump', branch='major/rewrite')
+        self.assertEqual((response['version_type'], response['next_version']), ('MAJOR', '2.0.0'))
+        self.assertEqual(self.query(command='predict_bump', branch='docs/readme')['next_version'], None)
+        self.assertTrue('error' in self.query(command='nope'))
+    def test_no_server(self):
+        self.assertEqual(get_version.get_server_version(socket_path=self.socket_path + '.missing'), None)
+
+class TestGlobFileVersioning(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'globs'])
+        create_repo('globs', config=config_data + """
+[bumpversion:glob:**/pom.xml]
+search = <version>{current_version}</version>
+replace = <version>{new_version}</version>
+
+[bumpversion:glob:*.json]
+""")
+        files = ['pom.xml', 'a/pom.xml', 'b/c/pom.xml', 'ignored/pom.xml', 'package.json', 'a/package.json']
+        for path in files:
+            path = os.path.join('globs', path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write("<version>0.0.0</version>")
+        with open('globs/.gitignore', 'w') as f:
+            f.write("ignored/\n")
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'globs'])
+    def test_glob_to_regex(self):
+        regex = globs.glob_to_regex('**/pom.xml')
+        self.assertTrue(regex.match('pom.xml'))
+        self.assertTrue(regex.match('a/b/pom.xml'))
+        self.assertFalse(regex.match('a/pom.xml.bak'))
+        self.assertFalse(globs.glob_to_regex('*.json').match('a/package.json'))
+    def test_expand_globs_respects_gitignore(self):
+        matches = globs.expand_globs(['**/pom.xml', '*.json'], 'globs')
+        self.assertEqual(matches['**/pom.xml'], ['a/pom.xml', 'b/c/pom.xml', 'pom.xml'])
+        self.assertEqual(matches['*.json'], ['package.json'])
+    def test_glob_file_bump(self):
+        report = bump.update_file_version("1.2.3", config=load_config('globs'), repo_path='globs')
+        self.assertEqual(sorted(path for path, count in report.items() if count),
+                         ['globs/a/pom.xml', 'globs/b/c/pom.xml', 'globs/package.json', 'globs/pom.xml'])
+        with open('globs/b/c/pom.xml', 'r') as f:
+            self.assertEqual(f.read(), "<version>1.2.3</version>")
+        with open('globs/ignored/pom.xml', 'r') as f:
+            self.assertEqual(f.read(), "<version>0.0.0</version>")
+    def test_file_and_glob_grouped(self):
+        create_repo('globs/grouped', config=config_data + """
+[bumpversion:file:./pom.xml]
+
+[bumpversion:glob:*.xml]
+""")
+        with open('globs/grouped/pom.xml', 'w') as f:
+            f.write("<version>0.0.0</version>")
+        report = bump.update_file_version("1.2.3", config=load_config('globs/grouped'), repo_path='globs/grouped')
+        self.assertEqual(list(report), ['globs/grouped/pom.xml'])
+        with open('globs/grouped/pom.xml', 'r') as f:
+            self.assertEqual(f.read(), "<version>1.2.3</version>")
+    def test_only_ignored_matches(self):
+        self.assertEqual(globs.expand_globs(['ignored/*.xml'], 'globs')['ignored/*.xml'], [])
+
+class TestTimings(unittest.TestCase):
+    def test_hook_sees_git_calls(self):
+        create_git_environment()
+        events = []
+        timings.add_hook(events.append)
+        try:
+            get_version.get_version()
+        finally:
+            timings.remove_hook(events.append)
+        self.assertTrue(events)
+        self.assertTrue(all(event['kind'] == 'git' and event['returncode'] == 0 for event in events))
+    def test_run_phases(self):
+        create_git_environment()
+        subprocess.call(['git', 'commit', '--allow-empty', '-m', "Merge branch 'patch/unittest' into 'master'"])
+        timings.start()
+        semver.SemVer().run(False)
+        records = timings.stop()
+        phases = [event['name'] for event in records if event['kind'] == 'phase']
+        self.assertEqual(phases, ['get_branches', 'get_version_type', 'version_repo'])
+        self.assertTrue('git tag 0.0.1' in [event['name'] for event in records])
+        self.assertTrue('version_repo' in timings.format_table(records))
+
+class TestBenchmarkRepo(unittest.TestCase):
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'bench'])
+    def test_synthetic_repo(self):
+        subprocess.call(['rm', '-rf', 'bench'])
+        benchmark.create_repo('bench', tags=120, branches=3, commits=10, files=2)
+        self.assertEqual(utils.get_tag_version(repo_path='bench'), benchmark.synthetic_version(119))
+        self.assertEqual(len(refs.read_tag_names('bench')), 120)
+        semver_object = semver.SemVer(repo_path='bench')
+        self.assertTrue(semver_object.get_branches())
+        self.assertEqual(semver_object.merged_branch, 'feature/benchmark')
+        self.assertEqual(sorted(bump.update_file_version('1.0.0', '0.0.0', repo_path='bench').values()), [1, 1])
+
 class TestGetCommitMessageRegex(unittest.TestCase):
     def test_github_message(self):
         matches = GET_COMMIT_MESSAGE.search("Merge pull request #1 from user/branch")
@@ -166,6 +911,95 @@ class TestGetCommitMessageRegex(unittest.TestCase):
         else:
             self.assertTrue(False)
 
+class TestRunOutput(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'output'])
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'output'])
+    def test_describe_versioned(self):
+        create_repo('output', 'minor/feature')
+        semver_object = semver.SemVer(repo_path='output').run(False)
+        result = semver_object.describe(build=4)
+        self.assertEqual((result['status'], result['merged_branch'], result['version_type']), (0, 'minor/feature', 'MINOR'))
+        self.assertEqual((result['previous_version'], result['new_version']), ('0.0.0', '0.1.0'))
+        self.assertEqual((result['resolved_version'], result['npm_version']), ('0.1.0', '0.1.0'))
+    def test_describe_feature_branch(self):
+        create_repo('output')
+        subprocess.call(['git', 'checkout', '-q', '-b', 'patch/fix'], cwd='output')
+        semver_object = semver.SemVer(repo_path='output')
+        with self.assertRaises(Exception) as error:
+            semver_object.run(False)
+        result = semver_object.describe(error.exception, build=4)
+        self.assertEqual((result['status'], result['new_version']), (1, None))
+        self.assertEqual(result['previous_version'], '0.0.0')
+        self.assertEqual(result['resolved_version'], 'patch.fix')
+        self.assertEqual(result['npm_version'], '0.0.1-patch-fix.4')
+        self.assertEqual(result['maven_version'], '0.0.1-patch-fix-4')
+    def test_env_output(self):
+        create_repo('output', 'patch/fix')
+        p = subprocess.Popen(['python', '../../__init__.py', '-n', '--output', 'env'], stdout=subprocess.PIPE,
+                             stderr=open(os.devnull, 'wb'), cwd='output')
+        lines = p.communicate()[0].decode('utf-8').splitlines()
+        self.assertEqual(p.returncode, 0)
+        self.assertTrue('SEMVER_STATUS=0' in lines)
+        self.assertTrue('SEMVER_NEW_VERSION=0.0.1' in lines)
+        self.assertTrue('SEMVER_ERROR=' in lines)
+
+class TestVersionNotes(unittest.TestCase):
+    def setUp(self):
+        subprocess.call(['rm', '-rf', 'noted'])
+        create_repo('noted', 'minor/feature')
+    def tearDown(self):
+        subprocess.call(['rm', '-rf', 'noted'])
+    def test_note_round_trip(self):
+        semver.SemVer(repo_path='noted', notes=True).run(False)
+        note = notes.read_note('HEAD', repo_path='noted')
+        self.assertEqual((note['version'], note['version_type'], note['merged_branch']), ('0.1.0', 'MINOR', 'minor/feature'))
+        head = git.output(['rev-parse', 'HEAD'], cwd='noted').strip()
+        self.assertEqual(notes.read_note(head, repo_path='noted'), note)
+        self.assertEqual(notes.read_note('HEAD~1', repo_path='noted'), None)
+        self.assertEqual(notes.read_note('no-such-rev', repo_path='noted'), None)
+    def test_no_notes_by_default(self):
+        semver.SemVer(repo_path='noted').run(False)
+        self.assertEqual(git.output(['notes', '--ref', notes.NOTES_REF, 'list'], cwd='noted'), '')
+    def test_note_paths(self):
+        sha = 'ab' * 20
+        self.assertEqual(notes.note_paths(sha)[:2], [notes.NOTES_REF + ':' + sha, notes.NOTES_REF + ':ab/' + sha[2:]])
+    def test_commit_lookup_command(self):
+        semver.SemVer(repo_path='noted', notes=True).run(False)
+        val = subprocess.Popen(['python', '../../get_version.py', '--commit', 'HEAD'], stdout=subprocess.PIPE,
+                               stderr=open(os.devnull, 'wb'), cwd='noted').communicate()[0].decode('utf-8').strip()
+        self.assertEqual(val, '0.1.0')
+
+class TestVersionValue(unittest.TestCase):
+    def test_precedence(self):
+        names = ['1.0.0', '1.0.0-rc.1', '1.0.0-beta.11', '1.0.0-beta.2', '1.0.0-alpha', '1.0.0-alpha.1',
+                 '1.0.0-alpha.beta', '1.0.0-beta', 'v0.9.0', '1.0.0+build.5', 'not-a-version', '01.0.0']
+        self.assertEqual([str(v) for v in versions.sort_versions(names)],
+                         ['v0.9.0', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.beta', '1.0.0-beta',
+                          '1.0.0-beta.2', '1.0.0-beta.11', '1.0.0-rc.1', '1.0.0', '1.0.0+build.5'])
+        self.assertEqual(versions.Version.parse('1.0.0+build.5'), versions.Version.parse('1.0.0'))
+    def test_max_version(self):
+        self.assertEqual(str(versions.max_version(['1.9.0', '1.10.0-rc.1', '1.9.9', 'junk'])), '1.10.0-rc.1')
+        self.assertEqual(str(versions.max_version(['2.0.0-rc.1', '2.0.0', '2.0.0-rc.2'])), '2.0.0')
+        self.assertEqual(versions.max_version(['junk']), None)
+    def test_bump_and_prerelease(self):
+        value = versions.Version.parse('1.2.3-rc.1+build')
+        self.assertEqual(str(value.bump(0)), '2.0.0')
+        self.assertEqual(str(value.bump(2)), '1.2.4')
+        self.assertEqual(str(value.bump(1).with_prerelease('feature-x', 3)), '1.3.0-feature-x.3')
+        with self.assertRaises(ValueError):
+            versions.Version.parse('1.2')
+    def test_sort_and_max_commands(self):
+        names = b'1.0.0\n1.0.0-rc.1\nv1.2.0\njunk\n0.9.0\n'
+        def run(*args):
+            p = subprocess.Popen(['python', '../__init__.py'] + list(args), stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE, cwd='.')
+            return p.communicate(names)[0].decode('utf-8').split()
+        self.assertEqual(run('sort'), ['0.9.0', '1.0.0-rc.1', '1.0.0', 'v1.2.0'])
+        self.assertEqual(run('sort', '--reverse')[0], 'v1.2.0')
+        self.assertEqual(run('max'), ['v1.2.0'])
+
 class TestVersionBumping(unittest.TestCase):
     def test_patch_bump(self):
         self.assertEqual("0.0.1", bump.bump_version("0.0.0", semver.VersionType.PATCH, False))
@@ -194,6 +1028,35 @@ class TestVersionBumping(unittest.TestCase):
         self.assertEqual("1.0.0", bump.bump_version("0.0.10", semver.VersionType.MAJOR, False))
         self.assertEqual("1.0.0", bump.bump_version("0.10.0", semver.VersionType.MAJOR, False))
         self.assertEqual("11.0.0", bump.bump_version("10.0.0", semver.VersionType.MAJOR, False))
+class TestTagNameBumping(unittest.TestCase):
+    def test_next_version_keeps_tag_name(self):
+        self.assertEqual(bump.next_version('release/1.0.0', 1, 'release/{new_version}'), 'release/1.1.0')
+        self.assertEqual(bump.next_version('v1.2.3', 0, 'v{new_version}'), 'v2.0.0')
+        self.assertEqual(bump.next_version('1.0.0-prod', 2, '{new_version}-prod'), '1.0.1-prod')
+        self.assertEqual(bump.next_version('1.02.0', 1), '1.3.0')
+        self.assertEqual(bump.next_version('1.2.0-rc.1', 2), '1.2.1')
+        # a bare current_version is named after the tag_name
+        self.assertEqual(bump.next_version('0.0.0', 1, 'release/{new_version}'), 'release/0.1.0')
+    def test_suffixed_tag_name_bump(self):
+        subprocess.call(['rm', '-rf', 'suffixed'])
+        create_repo('suffixed', 'minor/x', config=config_data.replace('tag_name = {new_version}', 'tag_name = {new_version}-prod'))
+        subprocess.call(['git', 'tag', '1.0.0-prod', 'HEAD~1'], cwd='suffixed')
+        with open('suffixed/file.txt', 'w') as f:
+            f.write('0.0.0')
+        self.assertEqual(semver.SemVer(repo_path='suffixed').run(False).new_version, '1.1.0-prod')
+        with open('suffixed/file.txt', 'r') as f:
+            self.assertEqual(f.read(), '1.1.0')
+        self.assertEqual(utils.get_tag_version(repo_path='suffixed'), '1.1.0-prod')
+        subprocess.call(['rm', '-rf', 'suffixed'])
+    def test_prefixed_tag_name_pre_release(self):
+        subprocess.call(['rm', '-rf', 'prefixed'])
+        create_repo('prefixed', config=config_data.replace('tag_name = {new_version}', 'tag_name = release/{new_version}'))
+        subprocess.call(['git', 'tag', 'release/1.0.0'], cwd='prefixed')
+        subprocess.call(['git', 'checkout', '-q', '-b', 'minor/x'], cwd='prefixed')
+        subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m', 'work'], cwd='prefixed')
+        self.assertEqual(get_version.get_version(version_format='npm', repo_path='prefixed'), "release/1.1.0-minor-x.0")
+        subprocess.call(['rm', '-rf', 'prefixed'])
+
 class TestFileVersioning(unittest.TestCase):
     def test_file_bump(self):
         with open('file.txt', 'w') as f:
@@ -225,6 +1088,39 @@ class TestFileVersioning(unittest.TestCase):
             file_data = f.read()
 
         self.assertEqual("version = 12.34.56", file_data.split('\n')[0])
+    def test_file_bump_report(self):
+        with open('file.txt', 'w') as f:
+            f.write("0.0.0\n0.0.0\n")
+        report = bump.update_file_version("12.34.56")
+        self.assertEqual(list(report.values()), [2])
+        with open('file.txt', 'r') as f:
+            self.assertEqual("12.34.56\n12.34.56\n", f.read())
+    def test_file_bump_no_match(self):
+        with open('file.txt', 'w') as f:
+            f.write("nothing to see here")
+        inode = os.stat('file.txt').st_ino
+        report = bump.update_file_version("12.34.56")
+        self.assertEqual(list(report.values()), [0])
+        self.assertEqual(inode, os.stat('file.txt').st_ino)
+    def test_rewrite_file_keeps_line_endings(self):
+        with open('file.txt', 'wb') as f:
+            f.write(b"version = 0.0.0\r\nname = test\r\n")
+        self.assertEqual(bump.rewrite_file('file.txt', "0.0.0", "1.0.0"), 1)
+        with open('file.txt', 'rb') as f:
+            self.assertEqual(b"version = 1.0.0\r\nname = test\r\n", f.read())
+    def test_rewrite_file_keeps_symlink(self):
+        with open('target.txt', 'w') as f:
+            f.write("0.0.0")
+        os.remove('file.txt')
+        os.symlink('target.txt', 'file.txt')
+        try:
+            self.assertEqual(list(bump.update_file_version("12.34.56").values()), [1])
+            self.assertTrue(os.path.islink('file.txt'))
+            with open('target.txt', 'r') as f:
+                self.assertEqual("12.34.56", f.read())
+        finally:
+            os.remove('file.txt')
+            os.remove('target.txt')
     
 def create_git_environment():
     subprocess.call(['rm', '-rf', './.git'])
@@ -234,6 +1130,18 @@ def create_git_environment():
     subprocess.call(['git', 'commit', '-m', 'file.txt'])
     subprocess.call(['git', 'remote', 'add', 'origin', os.getcwd()+'/.git'])
 
+# Standalone repository with its own config, optionally ending in a merge of `merged_branch`
+def create_repo(path, merged_branch=None, config=config_data):
+    os.makedirs(path)
+    with open(os.path.join(path, '.bumpversion.cfg'), 'w') as f:
+        f.write(config)
+    subprocess.call(['git', 'init', '-q'], cwd=path)
+    subprocess.call(['git', 'add', '.bumpversion.cfg'], cwd=path)
+    subprocess.call(['git', 'commit', '-q', '-m', 'initial commit'], cwd=path)
+    if merged_branch:
+        subprocess.call(['git', 'commit', '-q', '--allow-empty', '-m',
+                         "Merge branch '{}' into 'master'".format(merged_branch)], cwd=path)
+
 if __name__ == "__main__":
     console_logger.setLevel(logging.DEBUG)
 
@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+
+# Wall clock timings of git subprocesses and SemVer.run() phases.
+#
+# Nothing is kept unless recording was started with `start()` (the `--timings`
+# flags do this) or a hook was registered with `add_hook()`. Each event is a
+# dict with `kind` ("git" or "phase"), `name`, `started`, `seconds` and, for git
+# calls, `cwd` and `returncode`.
+
+_records = None
+_hooks = []
+
+def start():
+    global _records
+    _records = []
+
+# Stop recording and return everything recorded, oldest first
+def stop():
+    global _records
+    records, _records = _records or [], None
+    return sorted(records, key=lambda event: event['started'])
+
+# Call `hook(event)` for every timed event, e.g. to ship them to a metrics system
+def add_hook(hook):
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+def record(event):
+    if _records is not None:
+        _records.append(event)
+    for hook in list(_hooks):
+        hook(event)
+
+# Time the body of a `with` block. The yielded dict is the event, so callers
+# can add details such as the git exit code before it is recorded.
+@contextmanager
+def timed(kind, name, **fields):
+    event = dict(fields, kind=kind, name=name, started=time.time())
+    start_time = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event['seconds'] = time.perf_counter() - start_time
+        record(event)
+
+def format_table(records):
+    lines = ['{:<6} {:>9} {:>5}  {}'.format('kind', 'seconds', 'exit', 'name')]
+    for event in records:
+        returncode = event.get('returncode')
+        lines.append('{:<6} {:>9.4f} {:>5}  {}'.format(event['kind'], event['seconds'],
+                                                      '' if returncode is None else returncode,
+                                                      event['name']))
+    git_seconds = sum(event['seconds'] for event in records if event['kind'] == 'git')
+    git_calls = len([event for event in records if event['kind'] == 'git'])
+    lines.append('{} git call(s) took {:.4f}s'.format(git_calls, git_seconds))
+    return '\n'.join(lines)
+
+def write_json(records, path):
+    import json
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=2)
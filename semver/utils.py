@@ -1,41 +1,86 @@
-import subprocess
+import re
 from semver.logger import logging, logger, console_logger
+from semver import refs
+from semver.config import load_config
+from semver.scope import scoped_tag_version
 
-try:
-    from configparser import ConfigParser
-except ImportError:
-    # Python < 3
-    from ConfigParser import ConfigParser
+# Run a git command and return its decoded stdout, empty string on failure
+def git_output(args, cwd='.'):
+    from semver import git
+    return git.output(args, cwd=cwd)
 
-try:
-    from subprocess import DEVNULL # py3k
-except ImportError:
-    import os
-    DEVNULL = open(os.devnull, 'wb')
+# Run a git command with its output going to ours and return the exit code
+def git_call(args, cwd='.'):
+    from semver import git
+    return git.call(args, cwd=cwd)
 
-def get_tag_version():
-    config = ConfigParser()
-    config.read('./.bumpversion.cfg')
-    tag_expression = config.get('bumpversion','tag_name').replace('{new_version}','[0-9]*.[0-9]*.[0-9]*')
+# Compile `tag_name` into a regex matching only complete version tags, the
+# three version numbers are captured so they can be compared as integers
+def tag_version_pattern(tag_name):
+    prefix, _, suffix = tag_name.partition('{new_version}')
+    return re.compile('^' + re.escape(prefix) + r'(\d+)\.(\d+)\.(\d+)' + re.escape(suffix) + '$')
+
+# Highest version tag in `names` with a single pass and constant memory,
+# names that match the glob but aren't valid versions (e.g. `1.2.3rc`) are ignored.
+# `line` limits it to versions starting with those numbers, e.g. (1,) for 1.x.y
+def latest_version(names, pattern, line=None):
+    latest, latest_key = None, None
+    for name in names:
+        name = name.rstrip('\r\n')
+        matches = pattern.match(name)
+        if matches:
+            key = tuple(int(number) for number in matches.groups())
+            if line and key[:len(line)] != tuple(line):
+                continue
+            if latest_key is None or key > latest_key:
+                latest, latest_key = name, key
+    return latest
+
+# `head` is the (commit, branch name) `tag_scope` applies to, HEAD by default
+def get_tag_version(snapshot=None, config=None, repo_path='.', head=None):
+    if config is None:
+        config = load_config(repo_path)
+    tag_name = config.tag_name
+    tag_expression = tag_name.replace('{new_version}','[0-9]*.[0-9]*.[0-9]*')
+    tag_pattern = tag_version_pattern(tag_name)
 
     logger.debug("Tag expression: " + str(tag_expression))
 
     # Default version is `0.0.0` or what is found in 
     version = get_file_version(config)
 
-    # If a version is found in tags, use that the lastest tagged version
-    tagged_versions = subprocess.Popen(['git','tag','--sort=v:refname', '-l',tag_expression],
-        stdout=subprocess.PIPE, stderr=DEVNULL, cwd=".").stdout.read().decode('utf-8').rstrip().split('\n')
-    if len(tagged_versions) > 0 and tagged_versions[-1] != "":
-        version = tagged_versions[-1]
+    # If a version is found in tags, use that the lastest tagged version.
+    # Maintenance lines and ancestry (`tag_scope`) narrow down the tags first
+    tagged_version = scoped_tag_version(config, tag_expression, tag_pattern, snapshot, repo_path, head)
+    if tagged_version is None:
+        tagged_version = _latest_tag(snapshot, config, repo_path, tag_expression, tag_pattern)
+    if tagged_version:
+        version = tagged_version
 
     logger.debug("Tag Version: " + str(version))
     return version
 
-def get_file_version(config):
-    version = config.get('bumpversion','current_version')
-    if not version:
-        config.set('bumpversion', 'current_version', '0.0.0')
-        version = '0.0.0'
-    return version
+def _latest_tag(snapshot, config, repo_path, tag_expression, tag_pattern):
+    if snapshot is None and config.flag('tag_index'):
+        from semver.tagindex import TagIndex
+        index = TagIndex(repo_path, config)
+        if index.path is not None:
+            # Sorted index under .git/semver/, only reconciled when the tags changed
+            return index.latest()
 
+    tag_names = None
+    if snapshot is not None:
+        tag_names = snapshot.tags
+    elif config.setting('ref_backend', 'git') == 'python':
+        # Read the refs ourselves, None means the repository needs the git CLI
+        tag_names = refs.read_tag_names(repo_path)
+
+    if tag_names is not None:
+        return latest_version(tag_names, tag_pattern)
+
+    # Stream tag names from git instead of sorting and buffering all of them
+    from semver import git
+    return latest_version(git.stream(['tag', '-l', tag_expression], cwd=repo_path), tag_pattern)
+
+def get_file_version(config):
+    return config.current_version
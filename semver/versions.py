@@ -0,0 +1,129 @@
+import re
+from functools import total_ordering
+
+# Semantic Versioning 2.0.0 values, ordered by precedence:
+# 1.0.0-alpha < 1.0.0-alpha.1 < 1.0.0-beta < 1.0.0-rc.1 < 1.0.0 < 1.0.1
+#
+# A leading `v` is accepted and kept in `text`, build metadata is kept but
+# ignored when comparing. The sort key is computed once per value, so sorting
+# or taking the max of 100k tag names costs one regex match and one tuple per
+# name.
+
+VERSION = re.compile(r'^[vV]?(0|[1-9]\d*)\.(0|[1-9]\d*)\.(0|[1-9]\d*)'
+                     r'(?:-((?:0|[1-9]\d*|\d*[A-Za-z-][0-9A-Za-z-]*)(?:\.(?:0|[1-9]\d*|\d*[A-Za-z-][0-9A-Za-z-]*))*))?'
+                     r'(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?$')
+
+# released versions sort after every pre-release of the same version
+_RELEASE = (1,)
+
+def _identifier_key(identifier):
+    # numeric identifiers sort before alphanumeric ones and compare as numbers
+    if identifier.isdigit():
+        return (0, int(identifier), '')
+    return (1, 0, identifier)
+
+@total_ordering
+class Version(object):
+    __slots__ = ('major', 'minor', 'patch', 'prerelease', 'build', 'text', 'key')
+
+    def __init__(self, major, minor, patch, prerelease=(), build=(), text=None):
+        self.major, self.minor, self.patch = major, minor, patch
+        self.prerelease = tuple(prerelease)
+        self.build = tuple(build)
+        self.text = text if text is not None else self.format()
+        if self.prerelease:
+            self.key = (major, minor, patch, (0,) + tuple(_identifier_key(part) for part in self.prerelease))
+        else:
+            self.key = (major, minor, patch, _RELEASE)
+
+    # Version of a string, ValueError if it isn't a semantic version
+    @classmethod
+    def parse(cls, text):
+        version = cls.match(text)
+        if version is None:
+            raise ValueError("Not a semantic version: {!r}".format(text))
+        return version
+
+    # Like parse() but None for anything that isn't a semantic version
+    @classmethod
+    def match(cls, text):
+        matches = VERSION.match(text)
+        if not matches:
+            return None
+        return cls._from_groups(matches.groups(), text)
+
+    @classmethod
+    def _from_groups(cls, groups, text):
+        major, minor, patch, prerelease, build = groups
+        return cls(int(major), int(minor), int(patch),
+                   prerelease.split('.') if prerelease else (),
+                   build.split('.') if build else (), text)
+
+    def format(self):
+        text = '{}.{}.{}'.format(self.major, self.minor, self.patch)
+        if self.prerelease:
+            text += '-' + '.'.join(str(part) for part in self.prerelease)
+        if self.build:
+            text += '+' + '.'.join(str(part) for part in self.build)
+        return text
+
+    # Next release, `index` 0 for major, 1 for minor and 2 for patch. Lower
+    # numbers are reset, pre-release and build metadata dropped.
+    def bump(self, index=2):
+        numbers = [self.major, self.minor, self.patch]
+        numbers[index] += 1
+        for i in range(index + 1, 3):
+            numbers[i] = 0
+        return Version(*numbers)
+
+    # Same version with another pre-release, e.g. with_prerelease('feature-x', 3)
+    def with_prerelease(self, *identifiers):
+        return Version(self.major, self.minor, self.patch, [str(part) for part in identifiers])
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return 'Version({!r})'.format(self.text)
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+# Versions of the semantic version strings in `names`, anything else is skipped
+def parse_many(names):
+    match = Version.match
+    for name in names:
+        version = match(name.strip())
+        if version is not None:
+            yield version
+
+# Highest version in `names` with one pass and constant memory, None if there
+# is none. Only versions that could be the highest are turned into a Version.
+def max_version(names):
+    latest, latest_numbers = None, None
+    match = VERSION.match
+    for name in names:
+        name = name.strip()
+        matches = match(name)
+        if not matches:
+            continue
+        groups = matches.groups()
+        numbers = (int(groups[0]), int(groups[1]), int(groups[2]))
+        if latest is not None and numbers < latest_numbers:
+            continue
+        version = Version._from_groups(groups, name)
+        if latest is None or version.key > latest.key:
+            latest, latest_numbers = version, numbers
+    return latest
+
+def sort_versions(names, reverse=False):
+    return sorted(parse_many(names), key=lambda version: version.key, reverse=reverse)
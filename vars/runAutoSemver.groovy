@@ -24,7 +24,22 @@ def call(dockerImage = "rightbrainnetworks/auto-semver:latest", debug = false) {
       def RETURN_STATUS
       def regex = '^\\s*current_version\\s*=\\s*\\K[^\\s]+'
 
-      RETURN_STATUS = sh(script: "semver -n ${args}", returnStatus: true)
+      // One run reports the outcome and every resolved version, no second semver_get_version needed
+      RETURN_STATUS = sh(script: "semver -n --output env ${args} > semver.env", returnStatus: true)
+      def result = [:]
+      readFile('semver.env').readLines().each { line ->
+        def parts = line.split('=', 2)
+        if (parts.length == 2) {
+          result[parts[0]] = parts[1]
+        }
+      }
+      sh 'rm -f semver.env'
+      if (!result.containsKey('SEMVER_STATUS')) {
+        // Images from before --output reject it (argparse exits 2), run it the old way
+        echo 'semver has no --output, falling back to semver_get_version'
+        RETURN_STATUS = sh(script: "semver -n ${args}", returnStatus: true)
+        result['SEMVER_RESOLVED_VERSION'] = getVersion("-d ${args}")
+      }
       echo "Semver Return Status: ${RETURN_STATUS}"
       env.SEMVER_STATUS = RETURN_STATUS
       switch (RETURN_STATUS) {
@@ -40,8 +55,11 @@ def call(dockerImage = "rightbrainnetworks/auto-semver:latest", debug = false) {
           break
       }
 
-      env.SEMVER_NEW_VERSION = sh(script: "grep -Po '${regex}' .bumpversion.cfg", returnStdout: true).trim()
-      env.SEMVER_RESOLVED_VERSION = getVersion("-d ${args}")
+      // Nothing was versioned for statuses 1-3, keep the version the repository is at.
+      // The resolved version is a branch name off a tag, so it is never used here.
+      env.SEMVER_NEW_VERSION = result['SEMVER_NEW_VERSION'] ?: result['SEMVER_PREVIOUS_VERSION'] ?:
+        sh(script: "grep -Po '${regex}' .bumpversion.cfg", returnStdout: true).trim()
+      env.SEMVER_RESOLVED_VERSION = result['SEMVER_RESOLVED_VERSION']
 
       env.VERSION = env.SEMVER_RESOLVED_VERSION
     }